@@ -1,38 +1,63 @@
 import json, os, logging
-from openai import OpenAI #type: ignore
 from dotenv import load_dotenv
-from mcp_postgres import get_table_schema, PostgresMCP
+from resources import get_resources
+from session_store import sessions
+from query_cache import query_cache
+from mcp_excel import ExcelMCP
+from prompt_context import (
+    relevant_schema, schema_text, catalog_text, plan_text, fit_frame, count_tokens, log_usage, PROMPT_TOKEN_BUDGET
+)
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
-pg = PostgresMCP()
-
 # ============================================
 # 🧠 ANALIZADOR PRINCIPAL
 # ============================================
-async def analyze_query(prompt: str):
+async def analyze_query(prompt: str, session_id: str = None, previous_result_id: str = None):
     """
     Interpreta la pregunta natural, genera un plan (JSON) y ejecuta SQL real si corresponde.
+    Si la sesión tiene un resultado previo y la pregunta solo lo filtra, ordena o limita,
+    la mini consulta se resuelve en memoria sobre ese resultado (sin ir a la DB).
+    previous_result_id permite indicar explícitamente a qué resultado se refiere el seguimiento.
     """
-
-    # --- Obtener esquema real desde Postgres
-    schema = get_table_schema(pg.table)
-    schema_text = json.dumps(schema, ensure_ascii=False)
+    res = get_resources()
+    pg, client = res.pg, res.client
+
+    # --- Esquema desde el catálogo (cargado una vez por proceso, refrescado por el ETL)
+    schema = res.schema(pg.table)
+    tables = res.catalog.tables()
+    usage = {}
+    if len(tables) > 1:
+        tables_text = f"""Tablas disponibles (columna:tipo, con valores reales en columnas de pocos valores):
+{catalog_text(tables, prompt)}
+Si la consulta no es sobre "{pg.table}", agregá FROM <tabla> (ej: "SELECT SUM(Total) FROM otra_tabla;")."""
+    else:
+        tables_text = f"""Columnas relevantes (columna:tipo, con valores reales en columnas de pocos valores):
+{schema_text(relevant_schema(schema, prompt))}"""
+
+    # --- Resultado previo de la sesión (para preguntas de seguimiento)
+    # Con un id explícito no se usa otro resultado: si expiró, la pregunta va a la DB
+    previous = sessions.get(previous_result_id) if previous_result_id else sessions.latest(session_id)
+    previous_text = ""
+    if previous is not None:
+        previous_text = f"""
+Resultado anterior de esta conversación (consulta: {previous["sql"]}; {len(previous["df"])} filas; columnas: {", ".join(map(str, previous["df"].columns))}).
+Si la pregunta solo filtra, ordena o limita ese resultado, usá "action": "refine_previous" con una mini consulta
+sobre esas columnas, por ejemplo: "SELECT * WHERE SalesRep='X' ORDER BY Amount DESC LIMIT 5;"
+"""
 
     # --- Construcción del prompt mejorado
     plan_prompt = f"""
-Sos un asistente comercial con acceso a una base PostgreSQL llamada "{pg.table}".
-El esquema de la tabla es:
-{schema_text}
+Sos un asistente comercial con acceso a una base PostgreSQL (tabla principal "{pg.table}").
+{tables_text}
 
 Tu tarea es analizar la siguiente pregunta y devolver SOLO un JSON válido con este formato:
 {{
-  "action": "query_postgres" | "summary",
+  "action": "query_postgres" | "refine_previous" | "summary",
   "query": "<consulta SQL en formato MCP si aplica>",
   "need_data": true | false
 }}
@@ -42,14 +67,16 @@ Reglas:
 - Si es conceptual o general, usá "summary" y "need_data": false.
 - La consulta SQL debe ser simple y válida, por ejemplo:
   "SELECT SUM(Amount) WHERE Year=2025 AND Month=9;"
+  "SELECT Customer, SUM(Amount) WHERE SalesRep='<valor real>' GROUP BY Customer;"
+- Para filtrar por texto usá exactamente los valores listados en el esquema.
 - Si no se menciona un año, asumí el actual.
 - Siempre devolvé un JSON perfectamente formateado y válido.
-
+{previous_text}
 Pregunta del usuario:
 {prompt}
 """
 
-    logging.info(f"🧩 Prompt enviado al modelo:\n{plan_prompt}")
+    logging.info(f"🧩 Prompt enviado al modelo ({count_tokens(plan_prompt)} tokens):\n{plan_prompt}")
 
     try:
         resp = client.chat.completions.create(
@@ -57,6 +84,7 @@ Pregunta del usuario:
             messages=[{"role": "user", "content": plan_prompt}],
             temperature=0
         )
+        usage["plan"] = log_usage("plan", resp)
         content = resp.choices[0].message.content.strip()
         logging.info(f"🧠 Respuesta cruda del modelo: {content}")
     except Exception as e:
@@ -72,14 +100,32 @@ Pregunta del usuario:
 
     sql = plan.get("query")
 
+    # --- ♻️ Seguimiento: resolver sobre el resultado previo en memoria
+    data, source = None, "db"
+    if plan.get("action") == "refine_previous":
+        if previous is not None and sql:
+            try:
+                logging.info(f"♻️ Refinando resultado previo en memoria: {sql}")
+                data = ExcelMCP(df=previous["df"]).run_sql(sql)
+                data.attrs["guard"] = None
+                source = "session"
+            except Exception as e:
+                logging.warning(f"⚠️ No se pudo refinar el resultado previo ({e}); se consulta la DB.")
+        if data is None:
+            plan.update(action="query_postgres", need_data=True, query=None)
+            sql = None
+
     # --- 🔧 Si no hay SQL o need_data=False, forzar generación de SQL
     if not sql or not plan.get("need_data", True):
         logging.info("⚙️ Forzando generación de SQL por falta de plan válido...")
-        cols = ", ".join([c["column"] for c in schema])
+        cols = ", ".join([c["column"] for c in relevant_schema(schema, prompt)])
+        # En un seguimiento la pregunta sola ("ordenalo por monto") no alcanza: se parte de la consulta previa
+        previous_sql = f"""Es un seguimiento de esta consulta anterior, que la nueva debe ajustar: {previous["sql"]}
+""" if previous is not None else ""
         sql_prompt = f"""
 Convertí la siguiente pregunta en una mini consulta SQL para PostgreSQL (tabla "{pg.table}") usando las columnas [{cols}].
 Ejemplo de formato: SELECT SUM(Amount) WHERE Year=2025 AND Month=9;
-Pregunta: {prompt}
+{previous_sql}Pregunta: {prompt}
 """
         try:
             sql_resp = client.chat.completions.create(
@@ -88,6 +134,7 @@ Pregunta: {prompt}
                           {"role": "user", "content": sql_prompt}],
                 temperature=0
             )
+            usage["sql"] = log_usage("sql", sql_resp)
             sql = sql_resp.choices[0].message.content.strip().splitlines()[0]
             plan["query"] = sql
             plan["action"] = "query_postgres"
@@ -97,30 +144,35 @@ Pregunta: {prompt}
             sql = None
 
     # --- Ejecutar SQL si existe
-    data = None
-    if sql:
+    if sql and data is None:
         try:
             logging.info(f"🚀 Ejecutando SQL: {sql}")
-            data = pg.run_sql(sql)
+            data = query_cache.run(pg, sql)
         except Exception as e:
             logging.error(f"❌ Error al ejecutar SQL: {e}")
             data = None
+    result_id = sessions.put(session_id, sql, data)
 
     # --- Generar resumen comercial con IA
-    summary_prompt = f"""
+    def build_summary(data_text: str) -> str:
+        return f"""
 Usuario: {prompt}
-Acción planificada: {json.dumps(plan, indent=2, ensure_ascii=False)}
-Datos disponibles: {data.head(10).to_dict(orient='records') if data is not None and hasattr(data, 'head') else 'Sin datos o error.'}
+Acción planificada: {plan_text(plan)}
+Datos disponibles (CSV):
+{data_text}
 
 Resumí en lenguaje comercial claro, destacando hallazgos relevantes y contexto de negocio.
 """
 
+    summary_prompt = fit_frame(data, build_summary, PROMPT_TOKEN_BUDGET)
+
     try:
         summary = client.chat.completions.create(
             model=MODEL,
             messages=[{"role": "user", "content": summary_prompt}],
             temperature=0.2
         )
+        usage["summary"] = log_usage("summary", summary)
         response_text = summary.choices[0].message.content.strip()
     except Exception as e:
         response_text = f"Error al generar resumen: {e}"
@@ -130,5 +182,10 @@ Resumí en lenguaje comercial claro, destacando hallazgos relevantes y contexto
         "plan": plan,
         "sql": sql,
         "response": response_text,
+        "usage": usage,
+        "source": source,
+        "guard": data.attrs.get("guard") if data is not None and hasattr(data, "attrs") else None,
+        "result_id": result_id,
+        "total_rows": len(data) if data is not None and hasattr(data, "head") else 0,
         "data_preview": data.head(10).to_dict(orient="records") if data is not None and hasattr(data, "head") else []
     }
@@ -1,28 +1,94 @@
-from fastapi import FastAPI #type: ignore
+import os, asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, BackgroundTasks, Header, HTTPException #type: ignore
 from router_ai import router as ai_router
-from mcp_postgres import PostgresMCP, get_table_schema
+from resources import get_resources, WARMUP_ON_STARTUP
+from mcp_postgres import get_data_version
+from query_cache import query_cache
 
-app = FastAPI(title="MCP + IA API")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
-pg = PostgresMCP()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    res = get_resources()
+    # El warm-up corre en segundo plano: la API arranca y /ping responde sin esperar a la DB
+    warmup = asyncio.create_task(asyncio.to_thread(res.warmup)) if WARMUP_ON_STARTUP else None
+    yield
+    # cancel() no detiene el hilo de to_thread: el evento corta la espera entre reintentos
+    res.stop()
+    if warmup is not None:
+        await asyncio.wait({warmup}, timeout=5)
+    res.dispose()
+
+
+app = FastAPI(title="MCP + IA API", lifespan=lifespan)
 
 @app.get("/ping")
 def ping():
     return {"status": "ok", "msg": "API MCP + IA operativa"}
 
+@app.get("/data_version")
+def data_version():
+    res = get_resources()
+    return {"table": res.pg.table, "version": get_data_version(res.pg.table, res.engine)}
+
 @app.post("/query_postgres")
 async def query_postgres(body: dict):
     query = body.get("query")
     if not query:
         return {"error": "Falta parámetro 'query'"}
-    result = pg.run_sql(query)
-    return {"result": result.to_dict(orient="records") if not isinstance(result, dict) else result}
+    result = query_cache.run(get_resources().pg, query)
+    if isinstance(result, dict):
+        return {"result": result}
+    return {"result": result.to_dict(orient="records"), "guard": result.attrs.get("guard")}
+
+@app.post("/query_postgres/batch")
+async def query_postgres_batch(body: dict):
+    """
+    Varias mini consultas en un solo viaje: {"queries": {"clave": "SELECT ..."}} o {"queries": ["SELECT ...", ...]}.
+    Con una lista, cada resultado queda bajo el texto de su consulta.
+    """
+    queries = body.get("queries")
+    if isinstance(queries, list):
+        queries = {q: q for q in queries}
+    if not queries or not isinstance(queries, dict):
+        return {"error": "Falta parámetro 'queries'"}
+    for mini in queries.values():
+        query_cache.record(mini)
+    results = get_resources().pg.run_batch(queries)
+    return {
+        "results": {
+            key: {
+                "result": df.to_dict(orient="records"),
+                "guard": df.attrs.get("guard"),
+                "merged": df.attrs.get("merged", False),
+            }
+            for key, df in results.items()
+        }
+    }
 
 @app.post("/get_table_schema")
 async def get_schema(body: dict):
-    table = body.get("table_name", pg.table)
-    schema = get_table_schema(table)
+    res = get_resources()
+    table = body.get("table_name", res.pg.table)
+    schema = res.schema(table)
     return {"result": schema}
 
+@app.post("/admin/warmup")
+async def admin_warmup(background: BackgroundTasks, x_admin_token: Optional[str] = Header(None)):
+    """
+    Recalienta en segundo plano las consultas más frecuentes (lo invoca el ETL al terminar).
+    Sin ADMIN_TOKEN configurado el endpoint queda deshabilitado.
+    Solo calienta el worker de uvicorn que recibe el POST (ver QueryCache).
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Warm-up deshabilitado (falta ADMIN_TOKEN).")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Token de administración inválido.")
+    background.add_task(query_cache.warm, get_resources().pg)
+    return {"status": "started", "queries": len(query_cache.top())}
+
 # 🧠 Rutas IA
 app.include_router(ai_router, prefix="")
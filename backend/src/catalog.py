@@ -0,0 +1,168 @@
+import os, time, select, logging, threading
+import psycopg2 #type: ignore
+import psycopg2.extensions #type: ignore
+from sqlalchemy import text  # type: ignore
+
+CATALOG_TABLES = [t.strip() for t in os.getenv("CATALOG_TABLES", os.getenv("TABLE_NAME", "ventas")).split(",") if t.strip()]
+CATALOG_MAX_DISTINCT = int(os.getenv("CATALOG_MAX_DISTINCT", "30"))
+CATALOG_LISTEN = os.getenv("CATALOG_LISTEN", "true").lower() in ("1", "true", "yes")
+CATALOG_CHANNEL = "catalog_refresh"
+
+
+class Catalog:
+    """
+    Metadatos de las tablas que mantiene el ETL, cargados una vez y refrescados por eventos:
+      - Columnas y tipos, con resolución case-insensitive O(1).
+      - Filas estimadas (pg_class.reltuples, sumando particiones).
+      - Valores de columnas de baja cardinalidad (pg_stats.most_common_vals, sin escanear la tabla).
+    El ETL publica NOTIFY catalog_refresh '<tabla>' después de cada carga o cambio de DDL.
+    """
+
+    def __init__(self, engine, tables: list = None):
+        self.engine = engine
+        self.default = (tables or CATALOG_TABLES)[0]
+        # Solo estas tablas se exponen; nunca se agregan otras a pedido de un request
+        self._allowed = {t.lower(): t for t in (tables or CATALOG_TABLES)}
+        self._tables = {}   # nombre -> {"name", "rows", "columns": [...], "col_ci": {...}}
+        self._table_ci = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    # -------------------------------------------------------------------------
+    def load(self):
+        for table in self._allowed.values():
+            self.refresh(table)
+        return self
+
+    def refresh(self, table: str = None):
+        """Recarga una tabla de CATALOG_TABLES (o todas si table es None)."""
+        if table is None:
+            for t in self._allowed.values():
+                self.refresh(t)
+            return
+        table = self._allowed.get(table.strip().strip('"').lower())
+        if table is None:
+            return
+        info = self._read(table)
+        with self._lock:
+            if info is None:
+                self._tables.pop(table, None)
+                self._table_ci.pop(table.lower(), None)
+            else:
+                self._tables[table] = info
+                self._table_ci[table.lower()] = table
+        if info is None:
+            logging.warning(f"📚 Catálogo: la tabla {table} no existe.")
+        else:
+            logging.info(f"📚 Catálogo: {table} refrescada ({len(info['columns'])} columnas, ~{info['rows']} filas).")
+
+    def _read(self, table: str):
+        with self.engine.begin() as conn:
+            cols = conn.execute(text("""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_name = :t
+                ORDER BY ordinal_position;
+            """), {"t": table}).fetchall()
+            if not cols:
+                return None
+            rows = conn.execute(text("""
+                SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+                FROM pg_class c
+                WHERE c.oid = to_regclass(:q)
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:q));
+            """), {"q": f'"{table}"'}).scalar() or 0
+            # En tablas particionadas las estadísticas del padre se guardan con inherited = true
+            stats = conn.execute(text("""
+                SELECT DISTINCT ON (attname) attname, n_distinct, most_common_vals::text::text[]
+                FROM pg_stats
+                WHERE tablename = :t
+                ORDER BY attname, inherited DESC;
+            """), {"t": table}).fetchall()
+        low_card = {}
+        for name, n_distinct, mcv in stats:
+            distinct = n_distinct if n_distinct >= 0 else -n_distinct * rows
+            if mcv and 0 < distinct <= CATALOG_MAX_DISTINCT:
+                low_card[name] = list(mcv)
+        columns = []
+        for name, dtype in cols:
+            entry = {"column": name, "type": dtype}
+            if name in low_card and dtype in ("text", "character varying"):
+                entry["values"] = low_card[name]
+            columns.append(entry)
+        return {
+            "name": table,
+            "rows": int(rows),
+            "columns": columns,
+            "col_ci": {c["column"].lower(): c["column"] for c in columns},
+        }
+
+    # -------------------------------------------------------------------------
+    def tables(self) -> list:
+        return list(self._tables.values())
+
+    def resolve_table(self, name: str = None):
+        """Nombre exacto de una tabla del catálogo, la tabla por defecto si name es vacío, o None."""
+        if not name:
+            return self.default
+        return self._table_ci.get(name.strip().strip('"').lower())
+
+    def resolve_col(self, table: str, col: str) -> str:
+        col_clean = col.strip().replace('"', '')
+        info = self._tables.get(table)
+        if info is None:
+            return col_clean
+        return info["col_ci"].get(col_clean.lower(), col_clean)
+
+    def column_type(self, table: str, col: str):
+        info = self._tables.get(table)
+        if info is None:
+            return None
+        exact = info["col_ci"].get(col.lower())
+        return next((c["type"] for c in info["columns"] if c["column"] == exact), None)
+
+    def columns(self, table: str) -> set:
+        info = self._tables.get(table)
+        return set(info["col_ci"].values()) if info else set()
+
+    def schema(self, table: str = None) -> list:
+        table = self._allowed.get(table.strip().strip('"').lower()) if table else self.default
+        if table is None:
+            return []
+        if table not in self._tables:
+            self.refresh(table)
+        info = self._tables.get(table)
+        return [dict(c) for c in info["columns"]] if info else []
+
+    # -------------------------------------------------------------------------
+    def listen(self):
+        """Escucha NOTIFY catalog_refresh en un hilo de fondo y refresca la tabla indicada."""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_loop, name="catalog-listener", daemon=True)
+        self._listener.start()
+
+    def _listen_loop(self):
+        args = self.engine.url.translate_connect_args(username="user", database="dbname")
+        backoff = 1
+        while True:
+            try:
+                conn = psycopg2.connect(**args)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CATALOG_CHANNEL};")
+                logging.info("📚 Catálogo escuchando eventos del ETL.")
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    tables = set()
+                    while conn.notifies:
+                        tables.add(conn.notifies.pop(0).payload or None)
+                    for table in tables:
+                        self.refresh(table)
+            except Exception as e:
+                logging.warning(f"⚠️ Catálogo: se perdió la escucha de eventos ({e}); reintento en {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
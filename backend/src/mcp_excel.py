@@ -9,33 +9,52 @@ class ExcelMCP:
       - SELECT SUM(col) | AVG(col) | MAX(col) | MIN(col) | col1[, col2]
       - WHERE Year=YYYY [AND Month=M] [AND Date='YYYY-MM-DD']
       - WHERE Date BETWEEN 'YYYY-MM-DD' AND 'YYYY-MM-DD'
+      - WHERE col='valor' (igualdad sin distinguir mayúsculas)
       - GROUP BY Year | Month | col
       - ORDER BY <col|SUM(col)|AVG(col)|MAX(col)|MIN(col)> [ASC|DESC]
       - LIMIT N
     """
 
-    def __init__(self, file_path: str):
-        self.df = pd.read_excel(file_path, sheet_name=0)
+    def __init__(self, file_path: str = None, df: pd.DataFrame = None):
+        # Fuente: un Excel o un DataFrame ya cargado (p. ej. un resultado previo en memoria)
+        self.df = df.copy() if df is not None else pd.read_excel(file_path, sheet_name=0)
 
         # Detectar columna de fecha
         self.date_col = None
+        self._derived = []
         for col in self.df.columns:
-            if "date" in col.lower() or "fecha" in col.lower():
+            if "date" in str(col).lower() or "fecha" in str(col).lower():
                 self.date_col = col
                 break
         if self.date_col:
             self.df[self.date_col] = pd.to_datetime(self.df[self.date_col], errors="coerce")
-            self.df["Year"] = self.df[self.date_col].dt.year
-            self.df["Month"] = self.df[self.date_col].dt.month
-            self.df["Day"] = self.df[self.date_col].dt.date
+            for name, values in (("Year", self.df[self.date_col].dt.year),
+                                 ("Month", self.df[self.date_col].dt.month),
+                                 ("Day", self.df[self.date_col].dt.date)):
+                if name not in self.df.columns:
+                    self.df[name] = values
+                    self._derived.append(name)
 
         # Mapa case-insensitive de columnas
-        self._col_ci = {c.lower(): c for c in self.df.columns}
+        self._col_ci = {str(c).lower(): c for c in self.df.columns}
 
     def _resolve_col(self, name: str) -> str:
         """Resolver nombre de columna sin importar mayúsculas/minúsculas."""
         return self._col_ci.get(name.strip().lower(), name.strip())
 
+    def _check_where(self, where: str):
+        """Rechazar condiciones que el mini-SQL no sabe aplicar (>, <, LIKE, OR, ...)."""
+        where = re.sub(r"\bdate\s+between\s*'[\d\-]+'\s*and\s*'[\d\-]+'", "", where, flags=re.I)
+        for cond in re.split(r"\s+and\s+", where.strip(), flags=re.I):
+            cond = cond.strip()
+            if not cond:
+                continue
+            if re.fullmatch(r"(year\s*=\s*\d{4}|month\s*=\s*[0-9]{1,2})", cond, flags=re.I):
+                continue
+            if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*\s*=\s*'[^']*'", cond):
+                continue
+            raise ValueError(f"Filtro no soportado: {cond}")
+
     def run_sql(self, sql: str) -> pd.DataFrame:
         if not isinstance(sql, str) or not sql.strip():
             raise ValueError("Consulta vacía")
@@ -49,24 +68,46 @@ class ExcelMCP:
         date_eq_m = re.search(r"date\s*=\s*'([\d\-]+)'", raw)
         between_m = re.search(r"between\s*'([\d\-]+)'\s*and\s*'([\d\-]+)'", raw)
 
-        if year_m and "Year" in df:
-            df = df[df["Year"] == int(year_m.group(1))]
-        if month_m and "Month" in df:
-            df = df[df["Month"] == int(month_m.group(1))]
-        if date_eq_m and self.date_col:
+        # Un filtro que no se puede aplicar es un error: quien llama (analyze_query) vuelve a la BD
+        # en lugar de devolver un resultado sin filtrar
+        where_m = re.search(r"\bwhere\s+(.+?)(\s+group\s+by|\s+order\s+by|\s+limit|;|$)", sql, flags=re.I | re.S)
+        if where_m:
+            self._check_where(where_m.group(1))
+
+        # Year/Month=N solo sobre columnas numéricas (las derivadas de la fecha o equivalentes);
+        # un "Month" de texto ('2025-02', como lo guarda Postgres) nunca sería igual a N
+        for name, m in (("Year", year_m), ("Month", month_m)):
+            if not m:
+                continue
+            if name not in df or not pd.api.types.is_numeric_dtype(df[name]):
+                raise ValueError(f"Filtro por {name} sin columna numérica de {name}")
+            df = df[df[name] == int(m.group(1))]
+        if (date_eq_m or between_m) and not self.date_col:
+            raise ValueError("Filtro por Date sin columna de fecha")
+        if date_eq_m:
             d = pd.to_datetime(date_eq_m.group(1), errors="coerce")
             df = df[df[self.date_col].dt.date == d.date()]
-        if between_m and self.date_col:
+        if between_m:
             start, end = pd.to_datetime(between_m.group(1)), pd.to_datetime(between_m.group(2))
             df = df[(df[self.date_col] >= start) & (df[self.date_col] <= end)]
 
+        # Igualdades col='valor' (se leen del SQL original para conservar el case del valor)
+        if where_m:
+            for col, val in re.findall(r"([A-Za-z_][A-Za-z0-9_]*)\s*=\s*'([^']*)'", where_m.group(1)):
+                real = self._resolve_col(col)
+                if real == self.date_col:
+                    continue
+                if real not in df.columns:
+                    raise ValueError(f"Columna de filtro no encontrada: {col}")
+                df = df[df[real].astype(str).str.strip().str.lower() == val.strip().lower()]
+
         # --- SELECT ---
         sum_m = re.search(r"sum\(\s*([^)]+)\s*\)", raw)
         avg_m = re.search(r"avg\(\s*([^)]+)\s*\)", raw)
         max_m = re.search(r"max\(\s*([^)]+)\s*\)", raw)
         min_m = re.search(r"min\(\s*([^)]+)\s*\)", raw)
 
-        select_cols, agg, agg_col = None, None, None
+        select_cols, agg, agg_col, select_all = None, None, None, False
         if sum_m:
             agg, agg_col = "sum", self._resolve_col(sum_m.group(1))
         elif avg_m:
@@ -76,14 +117,16 @@ class ExcelMCP:
         elif min_m:
             agg, agg_col = "min", self._resolve_col(min_m.group(1))
         else:
-            m = re.search(r"select\s+(.+?)\s+(where|group by|order by|limit|$)", raw, flags=re.S)
+            m = re.search(r"select\s+(.+?)(\s+where|\s+group by|\s+order by|\s+limit|\s*;|$)", raw, flags=re.S)
             if m:
                 cols_part = m.group(1).strip()
                 if cols_part.lower() != "*":
                     select_cols = [self._resolve_col(c) for c in cols_part.split(",")]
+                else:
+                    select_all = True
 
         # --- GROUP BY ---
-        group_m = re.search(r"group\s+by\s+([a-zA-Z0-9_\- ]+)", raw)
+        group_m = re.search(r"group\s+by\s+([a-z0-9_\-]+)", raw)
         group_col = None
         if group_m:
             group_col = self._resolve_col(group_m.group(1))
@@ -106,11 +149,13 @@ class ExcelMCP:
             if not keep:
                 raise ValueError("Columnas de SELECT no válidas")
             result = df[keep]
+        elif select_all:
+            result = df.drop(columns=self._derived)
         else:
             raise ValueError("No pude interpretar la consulta")
 
         # --- ORDER BY ---
-        order_m = re.search(r"order\s+by\s+([a-zA-Z0-9_\(\) ]+)(\s+asc|\s+desc)?", raw)
+        order_m = re.search(r"order\s+by\s+([a-z0-9_]+(?:\s*\([^)]*\))?)(\s+asc|\s+desc)?", raw)
         if order_m:
             order_key = self._resolve_col(order_m.group(1))
             ascending = not (order_m.group(2) and "desc" in order_m.group(2))
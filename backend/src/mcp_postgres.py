@@ -1,20 +1,36 @@
-import os, re
+import os, re, logging
+from collections import OrderedDict
 import pandas as pd
 from sqlalchemy import create_engine, text  # type: ignore
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Guardia previa a la ejecución (EXPLAIN) para SQL generada por el modelo
+SQL_GUARD_MAX_ROWS = int(os.getenv("SQL_GUARD_MAX_ROWS", "5000"))
+SQL_GUARD_MAX_COST = float(os.getenv("SQL_GUARD_MAX_COST", "1000000"))
+SQL_GUARD_ACTION = os.getenv("SQL_GUARD_ACTION", "limit").lower()  # limit | reject
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+
+# Condiciones de WHERE que la mini-sintaxis sabe traducir, unidas solo por AND
+WHERE_COND = (
+    r"(?:date\s+between\s*'[\d\-]+'\s*and\s*'[\d\-]+'"
+    r"|year\s*=\s*\d{4}"
+    r"|month\s*=\s*[0-9]{1,2}"
+    r"|[a-z_][a-z0-9_]*\s*=\s*'[^']*')"
+)
+
 class PostgresMCP:
     """
-    MCP (Mini Command Processor) para ejecutar consultas simplificadas sobre una tabla de Postgres.
+    MCP (Mini Command Processor) para ejecutar consultas simplificadas sobre tablas de Postgres.
+    Sin FROM la consulta va a la tabla por defecto; con un Catalog asociado admite "FROM <tabla>".
     Incluye:
       - Resolución automática de columnas con mayúsculas/minúsculas.
       - Soporte para nombres entrecomillados ("Date").
       - Ejecución robusta en entornos donde la DB difiere en case sensitivity.
     """
 
-    def __init__(self):
+    def __init__(self, catalog=None):
         DB = os.getenv("POSTGRES_DB")
         USER = os.getenv("POSTGRES_USER")
         PWD = os.getenv("POSTGRES_PASSWORD")
@@ -22,27 +38,64 @@ class PostgresMCP:
         PORT = os.getenv("POSTGRES_PORT", "5432")
         self.table = os.getenv("TABLE_NAME", "ventas")
 
-        self.engine = create_engine(f"postgresql+psycopg2://{USER}:{PWD}@{HOST}:{PORT}/{DB}")
+        # create_engine no abre conexiones: la primera consulta real es la que conecta
+        self.engine = create_engine(
+            f"postgresql+psycopg2://{USER}:{PWD}@{HOST}:{PORT}/{DB}", pool_pre_ping=True
+        )
+        self.catalog = catalog
+        self._col_ci = None
+        self._date_type = None
+
+    @property
+    def columns(self) -> set:
+        """Columnas con su case exacto (del catálogo, o leídas de la DB en el primer uso)."""
+        if self.catalog is not None:
+            return self.catalog.columns(self.table)
+        if self._col_ci is None:
+            with self.engine.begin() as conn:
+                cols = conn.execute(text(f'SELECT * FROM "{self.table}" LIMIT 0')).keys()
+            self._col_ci = {c.lower(): c for c in cols}
+        return set(self._col_ci.values())
+
+    def _date_expr(self, table: str) -> str:
+        """
+        "Date" tal cual si la columna es date/timestamp (los rangos usan índice y particiones);
+        si es TEXT (tabla creada por versiones anteriores del ETL) se castea como antes.
+        """
+        if self.catalog is not None:
+            dtype = self.catalog.column_type(table, "Date")
+        else:
+            if self._date_type is None:
+                with self.engine.begin() as conn:
+                    self._date_type = conn.execute(text("""
+                        SELECT data_type FROM information_schema.columns
+                        WHERE table_name = :t AND column_name = 'Date';
+                    """), {"t": self.table}).scalar() or ""
+            dtype = self._date_type
+        if dtype and not dtype.startswith(("timestamp", "date")):
+            return '"Date"::timestamp'
+        return '"Date"'
 
-        # Obtener columnas con su case exacto
-        with self.engine.begin() as conn:
-            cols = conn.execute(text(f'SELECT * FROM "{self.table}" LIMIT 0')).keys()
-        self.columns = set(cols)
+    def _table_columns(self, table: str) -> set:
+        if self.catalog is not None:
+            return self.catalog.columns(table)
+        return self.columns if table == self.table else set()
 
     # -------------------------------------------------------------------------
-    def _resolve_col(self, col: str) -> str:
+    def _resolve_col(self, col: str, table: str = None) -> str:
         """
         Resuelve el nombre real de columna respetando el case exacto de Postgres.
-        Si existe en self.columns (case-insensitive), devuelve la versión exacta.
+        Si existe en la tabla (case-insensitive), devuelve la versión exacta.
         Si no existe, devuelve el nombre limpio.
         """
+        table = table or self.table
+        if self.catalog is not None:
+            return self.catalog.resolve_col(table, col)
         col_clean = col.strip().replace('"', '')
-        for c in self.columns:
-            if c.lower() == col_clean.lower():
-                return c  # devuelve el nombre exacto
-        return col_clean
+        self.columns
+        return self._col_ci.get(col_clean.lower(), col_clean)
 
-    def _resolve_agg(self, expr: str) -> str:
+    def _resolve_agg(self, expr: str, table: str = None) -> str:
         inner = re.search(r"\(\s*([^)]+)\s*\)", expr)
         func = expr.split("(")[0].upper()
         col = inner.group(1).strip() if inner else ""
@@ -50,23 +103,43 @@ class PostgresMCP:
             return f"{func}(*)"
         if col.lower().startswith("distinct "):
             inner_col = col[9:].strip()
-            match = self._resolve_col(inner_col)
+            match = self._resolve_col(inner_col, table)
             return f'{func}(DISTINCT "{match}")'
-        match = self._resolve_col(col)
+        match = self._resolve_col(col, table)
         return f'{func}("{match}")'
 
     # -------------------------------------------------------------------------
-    def build_sql(self, mini: str) -> str:
-        raw = mini.strip()
+    def parse_mini(self, mini: str) -> dict:
+        """
+        Descompone la mini-sintaxis en partes SQL ya resueltas:
+        table, select (expresiones), aggregate (solo agregados), where (cláusulas),
+        group_by, order_by y limit.
+        """
+        # El ";" final no forma parte de la última cláusula (GROUP BY Customer;)
+        raw = mini.strip().rstrip(";").strip()
         low = raw.lower()
 
+        # FROM (opcional): solo tablas conocidas por el catálogo.
+        # Se busca solo entre la lista del SELECT y WHERE/GROUP/ORDER/LIMIT (no dentro de valores).
+        table = self.table
+        head = re.split(r"\s+(?:where|group\s+by|order\s+by|limit)\b", low, maxsplit=1)[0]
+        m_from = re.search(r'\sfrom\s+"?([a-z0-9_]+)"?\s*;?\s*$', head)
+        if m_from:
+            name = m_from.group(1)
+            if self.catalog is not None:
+                table = self.catalog.resolve_table(name)
+            elif name != self.table.lower():
+                table = None
+            if table is None:
+                raise ValueError(f"Tabla no permitida: {name}")
+
         # SELECT
-        m_sel = re.search(r"select\s+(.+?)(\s+where|\s+group by|\s+order by|\s+limit|$)", low, flags=re.S)
+        m_sel = re.search(r"select\s+(.+?)(\s+from|\s+where|\s+group by|\s+order by|\s+limit|$)", low, flags=re.S)
         select_txt = m_sel.group(1).strip() if m_sel else "*"
 
-        # WHERE
+        # WHERE (del texto original, para conservar el case de los valores)
         where_section = ""
-        m_where = re.search(r"where\s+(.+?)(\s+group by|\s+order by|\s+limit|$)", low, flags=re.S)
+        m_where = re.search(r"\bwhere\s+(.+?)(\s+group\s+by|\s+order\s+by|\s+limit|$)", raw, flags=re.I | re.S)
         if m_where:
             where_section = m_where.group(1).strip()
 
@@ -75,7 +148,7 @@ class PostgresMCP:
         m_gb = re.search(r"group\s+by\s+(.+?)(\s+order by|\s+limit|$)", low, flags=re.S)
         if m_gb:
             group_expr = m_gb.group(1).strip()
-            group_by = self._resolve_col(group_expr)
+            group_by = self._resolve_col(group_expr, table)
 
         # SELECT cols
         select_cols = []
@@ -88,14 +161,14 @@ class PostgresMCP:
                     select_cols.append(f"{fn_up}(*)")
                 elif col_txt.lower().startswith("distinct "):
                     col_inner = col_txt[9:].strip()
-                    col_real = self._resolve_col(col_inner)
+                    col_real = self._resolve_col(col_inner, table)
                     select_cols.append(f'{fn_up}(DISTINCT "{col_real}")')
                 else:
-                    col_real = self._resolve_col(col_txt)
+                    col_real = self._resolve_col(col_txt, table)
                     select_cols.append(f'{fn_up}("{col_real}")')
         elif select_txt != "*":
             cols = [c.strip() for c in re.split(r"\s*,\s*", select_txt)]
-            select_cols = [f'"{self._resolve_col(c)}"' for c in cols]
+            select_cols = [f'"{self._resolve_col(c, table)}"' for c in cols]
         else:
             select_cols = ["*"]
 
@@ -103,68 +176,276 @@ class PostgresMCP:
         if group_by and f'"{group_by}"' not in select_cols:
             select_cols.insert(0, f'"{group_by}"')
 
-        sql = "SELECT " + ", ".join(select_cols) + f' FROM "{self.table}"'
-
         # WHERE clauses
+        # Los filtros de fecha se traducen a rangos sobre "Date" para que Postgres
+        # pueda usar el índice y descartar particiones mensuales (partition pruning).
+        # Una condición que no se puede traducir (OR, <>, >, LIKE...) es un error:
+        # ignorarla devolvería un total sin filtrar.
         where_clauses = []
         if where_section:
-            m_year = re.search(r"year\s*=\s*(\d{4})", where_section)
-            if m_year:
-                where_clauses.append(f'"Year"={int(m_year.group(1))}')
-            m_month = re.search(r"month\s*=\s*([0-9]{1,2})", where_section)
-            if m_month:
-                where_clauses.append(f'"Month"={int(m_month.group(1))}')
-            m_date = re.search(r"date\s*=\s*'([\d\-]+)'", where_section)
-            if m_date:
-                where_clauses.append(f'"Date"::date = DATE \'{m_date.group(1)}\'')
-            m_between = re.search(r"between\s*'([\d\-]+)'\s*and\s*'([\d\-]+)'", where_section)
-            if m_between:
-                a, b = m_between.groups()
-                where_clauses.append(f'"Date" BETWEEN DATE \'{a}\' AND DATE \'{b}\'')
-
-        if where_clauses:
-            sql += " WHERE " + " AND ".join(where_clauses)
-
-        # GROUP BY
-        if group_by:
-            sql += f' GROUP BY "{group_by}"'
+            if not re.fullmatch(rf"{WHERE_COND}(?:\s+and\s+{WHERE_COND})*", where_section, flags=re.I | re.S):
+                raise ValueError(f"Filtro no soportado: {where_section}")
+            d_col = self._date_expr(table)
+            known = {c.lower() for c in self._table_columns(table)}
+            year = month = None
+            for cond in re.findall(WHERE_COND, where_section, flags=re.I):
+                m_between = re.match(r"date\s+between\s*'([\d\-]+)'\s*and\s*'([\d\-]+)'", cond, flags=re.I)
+                m_eq = re.match(r"([a-z_][a-z0-9_]*)\s*=\s*(?:(\d+)|'([^']*)')$", cond, flags=re.I)
+                if m_between:
+                    a, b = m_between.groups()
+                    where_clauses.append(f'{d_col} >= DATE \'{a}\' AND {d_col} < DATE \'{b}\' + 1')
+                    continue
+                col, num, val = m_eq.groups()
+                if num is not None:
+                    if col.lower() == "year":
+                        year = int(num)
+                    else:
+                        month = int(num)
+                elif col.lower() == "date":
+                    where_clauses.append(f'{d_col} >= DATE \'{val}\' AND {d_col} < DATE \'{val}\' + 1')
+                elif col.lower() in known:
+                    where_clauses.append(f'"{self._resolve_col(col, table)}" = \'{val}\'')
+                else:
+                    raise ValueError(f"Columna de filtro no encontrada: {col}")
+            if year and month:
+                ny, nm = (year + 1, 1) if month == 12 else (year, month + 1)
+                where_clauses.insert(0,
+                    f'{d_col} >= DATE \'{year:04d}-{month:02d}-01\' AND {d_col} < DATE \'{ny:04d}-{nm:02d}-01\''
+                )
+            elif year:
+                where_clauses.insert(0, f'{d_col} >= DATE \'{year:04d}-01-01\' AND {d_col} < DATE \'{year + 1:04d}-01-01\'')
+            elif month:
+                where_clauses.insert(0, f'EXTRACT(MONTH FROM {d_col}) = {month}')
 
         # ORDER BY
-        m_ob = re.search(r"order\s+by\s+([a-zA-Z0-9_\(\) ]+)(\s+asc|\s+desc)?", low)
+        order_by = None
+        m_ob = re.search(r"order\s+by\s+([a-z0-9_]+(?:\s*\([^)]*\))?)(\s+asc|\s+desc)?", low)
         if m_ob:
             ob_key = m_ob.group(1).strip()
             ob_dir = " DESC" if m_ob.group(2) and "desc" in m_ob.group(2).lower() else " ASC"
             ob_sql = (
-                self._resolve_agg(ob_key)
+                self._resolve_agg(ob_key, table)
                 if ob_key.lower().startswith(("sum(", "avg(", "max(", "min(", "count("))
-                else f'"{self._resolve_col(ob_key)}"'
+                else f'"{self._resolve_col(ob_key, table)}"'
             )
             if group_by in ("Month", "Year", "Day", "Date"):
                 ob_sql = f'"{group_by}"'
                 ob_dir = " ASC"
-            sql += f" ORDER BY {ob_sql}{ob_dir}"
+            order_by = f"{ob_sql}{ob_dir}"
         elif group_by in ("Month", "Year", "Day", "Date"):
-            sql += f' ORDER BY "{group_by}" ASC'
+            order_by = f'"{group_by}" ASC'
 
         # LIMIT
         m_lim = re.search(r"limit\s+(\d+)", low)
-        if m_lim:
-            sql += f" LIMIT {int(m_lim.group(1))}"
 
+        return {
+            "table": table,
+            "select": select_cols,
+            "aggregate": bool(aggs),
+            "where": where_clauses,
+            "group_by": group_by,
+            "order_by": order_by,
+            "limit": int(m_lim.group(1)) if m_lim else None,
+        }
+
+    def build_sql(self, mini: str) -> str:
+        return self.render_sql(self.parse_mini(mini))
+
+    @staticmethod
+    def render_sql(q: dict) -> str:
+        """Arma el SQL final a partir de las partes devueltas por parse_mini."""
+        sql = "SELECT " + ", ".join(q["select"]) + f' FROM "{q["table"]}"'
+        if q["where"]:
+            sql += " WHERE " + " AND ".join(q["where"])
+        if q["group_by"]:
+            sql += f' GROUP BY "{q["group_by"]}"'
+        if q["order_by"]:
+            sql += f" ORDER BY {q['order_by']}"
+        if q["limit"] is not None:
+            sql += f" LIMIT {q['limit']}"
         return sql + ";"
 
     # -------------------------------------------------------------------------
     def run_sql(self, mini: str) -> pd.DataFrame:
         """
         Ejecuta SQL traducida desde mini-sintaxis y devuelve DataFrame.
+        La decisión de la guardia queda en df.attrs["guard"].
         """
+        guard = None
         try:
             sql = self.build_sql(mini)
             with self.engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}"))
+                sql, guard = self.guard_sql(conn, sql)
+                if guard["action"] == "rejected":
+                    df = pd.DataFrame({"error": [guard["reason"]], "sql": [mini]})
+                else:
+                    df = pd.read_sql(text(sql), con=conn)
+        except Exception as e:
+            df = pd.DataFrame({"error": [str(e)], "sql": [mini]})
+        df.attrs["guard"] = guard
+        return df
+
+    # -------------------------------------------------------------------------
+    def run_batch(self, queries: dict) -> dict:
+        """
+        Ejecuta varias mini consultas en una sola conexión y un mismo snapshot
+        (REPEATABLE READ, solo lectura). Los agregados sin LIMIT sobre la misma tabla
+        y los mismos filtros se combinan en un único scan con GROUPING SETS.
+        Devuelve {clave: DataFrame} en el orden recibido; df.attrs["merged"] indica si
+        el resultado salió de un scan combinado.
+        """
+        results, parsed = {}, {}
+        for key, mini in queries.items():
+            try:
+                parsed[key] = self.parse_mini(mini)
+            except Exception as e:
+                results[key] = pd.DataFrame({"error": [str(e)], "sql": [mini]})
+
+        groups = OrderedDict()
+        singles = []
+        for key, q in parsed.items():
+            if self._mergeable(q):
+                groups.setdefault((q["table"], tuple(q["where"])), []).append(key)
+            else:
+                singles.append(key)
+
+        scans = 0
+        try:
+            with self.engine.connect().execution_options(
+                isolation_level="REPEATABLE READ", postgresql_readonly=True
+            ) as conn:
+                with conn.begin():
+                    conn.execute(text(f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}"))
+                    for keys in groups.values():
+                        merged = self._run_merged(conn, [(k, parsed[k]) for k in keys]) if len(keys) > 1 else None
+                        if merged is None:
+                            singles.extend(keys)
+                            continue
+                        results.update(merged)
+                        scans += 1
+                    for key in singles:
+                        results[key] = self._run_in(conn, queries[key], self.render_sql(parsed[key]))
+                        scans += 1
+        except Exception as e:
+            for key in queries:
+                results.setdefault(key, pd.DataFrame({"error": [str(e)], "sql": [queries[key]]}))
+
+        logging.info(f"📦 Batch: {len(queries)} consultas resueltas con {scans} scans.")
+        return {key: results[key] for key in queries}
+
+    @staticmethod
+    def _mergeable(q: dict) -> bool:
+        if not q["aggregate"] or q["limit"] is not None:
+            return False
+        # Solo se admite ordenar por la columna agrupada (se reaplica al separar resultados)
+        return q["order_by"] is None or (
+            q["group_by"] is not None and q["order_by"].startswith(f'"{q["group_by"]}"')
+        )
+
+    def _run_in(self, conn, mini: str, sql: str) -> pd.DataFrame:
+        """Una consulta dentro de la transacción del batch, aislada con un savepoint."""
+        guard = None
+        try:
+            with conn.begin_nested():
+                sql, guard = self.guard_sql(conn, sql)
+                if guard["action"] == "rejected":
+                    df = pd.DataFrame({"error": [guard["reason"]], "sql": [mini]})
+                else:
+                    df = pd.read_sql(text(sql), con=conn)
+        except Exception as e:
+            df = pd.DataFrame({"error": [str(e)], "sql": [mini]})
+        df.attrs["guard"] = guard
+        return df
+
+    def _run_merged(self, conn, members: list):
+        """
+        Combina agregados con los mismos filtros en un SELECT con GROUPING SETS y separa
+        las filas de cada consulta usando GROUPING(). Devuelve None si no conviene combinar.
+        """
+        table, where = members[0][1]["table"], members[0][1]["where"]
+        group_cols = list(OrderedDict.fromkeys(q["group_by"] for _, q in members if q["group_by"]))
+        aliases = OrderedDict()
+        for _, q in members:
+            for expr in q["select"]:
+                if expr != f'"{q["group_by"]}"':
+                    aliases.setdefault(expr, f"a{len(aliases)}")
+
+        select = [f'"{g}"' for g in group_cols]
+        select += [f"{expr} AS {alias}" for expr, alias in aliases.items()]
+        select += [f'GROUPING("{g}") AS g{i}' for i, g in enumerate(group_cols)]
+        sets = [f'("{g}")' for g in group_cols]
+        if any(q["group_by"] is None for _, q in members):
+            sets.append("()")
+        sql = "SELECT " + ", ".join(select) + f' FROM "{table}"'
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY GROUPING SETS (" + ", ".join(sets) + ");"
+
+        try:
+            with conn.begin_nested():
+                sql, guard = self.guard_sql(conn, sql)
+                if guard["action"] != "allowed":
+                    # Un LIMIT inyectado o un rechazo romperían el reparto: mejor por separado
+                    return None
                 df = pd.read_sql(text(sql), con=conn)
-            return df
         except Exception as e:
-            return pd.DataFrame({"error": [str(e)], "sql": [mini]})
+            logging.warning(f"⚠️ Batch: no se pudo combinar ({e}); se ejecuta por separado.")
+            return None
+
+        out = {}
+        for key, q in members:
+            mask = pd.Series(True, index=df.index)
+            for i, g in enumerate(group_cols):
+                mask &= df[f"g{i}"] == (0 if g == q["group_by"] else 1)
+            exprs = [e for e in q["select"] if e != f'"{q["group_by"]}"']
+            cols = ([q["group_by"]] if q["group_by"] else []) + [aliases[e] for e in exprs]
+            part = df.loc[mask, cols].copy()
+            # Mismos nombres que devolvería la consulta individual (sum, count, ...)
+            part.columns = ([q["group_by"]] if q["group_by"] else []) + [e.split("(")[0].lower() for e in exprs]
+            if q["order_by"]:
+                part = part.sort_values(q["group_by"], ascending=not q["order_by"].endswith("DESC"))
+            part = part.reset_index(drop=True)
+            part.attrs["guard"] = guard
+            part.attrs["merged"] = True
+            out[key] = part
+        return out
+
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _explain(conn, sql: str) -> tuple:
+        """Devuelve (filas estimadas, costo total) según el planner de Postgres."""
+        plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql.rstrip().rstrip(";"))).scalar()
+        root = plan[0]["Plan"]
+        return root.get("Plan Rows", 0), root.get("Total Cost", 0.0)
+
+    def guard_sql(self, conn, sql: str) -> tuple:
+        """
+        Compara la estimación de EXPLAIN contra los umbrales configurados.
+        Si excede filas y no tiene LIMIT, según SQL_GUARD_ACTION inyecta un LIMIT o rechaza.
+        Si excede costo (aun con LIMIT), rechaza.
+        Devuelve (sql a ejecutar, decisión).
+        """
+        rows, cost = self._explain(conn, sql)
+        guard = {"action": "allowed", "estimated_rows": rows, "estimated_cost": cost, "reason": None}
+
+        if rows > SQL_GUARD_MAX_ROWS and not re.search(r"\blimit\s+\d+", sql, flags=re.I):
+            if SQL_GUARD_ACTION == "limit":
+                sql = sql.rstrip().rstrip(";") + f" LIMIT {SQL_GUARD_MAX_ROWS};"
+                rows, cost = self._explain(conn, sql)
+                guard.update(action="limited", estimated_rows=rows, estimated_cost=cost,
+                             reason=f"Se estimaban más de {SQL_GUARD_MAX_ROWS} filas; se aplicó LIMIT {SQL_GUARD_MAX_ROWS}.")
+            else:
+                guard.update(action="rejected",
+                             reason=f"Consulta rechazada: se estiman {int(rows)} filas (máximo {SQL_GUARD_MAX_ROWS}). Agregá filtros o un LIMIT.")
+
+        if guard["action"] != "rejected" and cost > SQL_GUARD_MAX_COST:
+            guard.update(action="rejected",
+                         reason=f"Consulta rechazada: costo estimado {cost:.0f} supera el máximo {SQL_GUARD_MAX_COST:.0f}. Acotá el rango de fechas.")
+
+        log = logging.warning if guard["action"] != "allowed" else logging.info
+        log(f"🛡️ Guardia SQL: {guard['action']} (filas≈{int(guard['estimated_rows'])}, costo≈{guard['estimated_cost']:.0f}) {guard['reason'] or ''}")
+        return sql, guard
 
     # -------------------------------------------------------------------------
     @staticmethod
@@ -177,19 +458,16 @@ class PostgresMCP:
         return df
 
 
-def get_table_schema(table_name: str):
-    DB = os.getenv("POSTGRES_DB")
-    USER = os.getenv("POSTGRES_USER")
-    PWD = os.getenv("POSTGRES_PASSWORD")
-    HOST = os.getenv("POSTGRES_HOST", "db")
-    PORT = os.getenv("POSTGRES_PORT", "5432")
-    engine = create_engine(f"postgresql+psycopg2://{USER}:{PWD}@{HOST}:{PORT}/{DB}")
+def get_data_version(table_name: str, engine) -> int:
+    """
+    Versión barata de los datos: total de filas insertadas/actualizadas/borradas según
+    pg_stat (tabla y sus particiones). Cambia después de cada carga del ETL.
+    """
     query = text("""
-        SELECT column_name, data_type
-        FROM information_schema.columns
-        WHERE table_name = :t
-        ORDER BY ordinal_position;
+        SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+        FROM pg_stat_user_tables
+        WHERE relid = to_regclass(:t)
+           OR relid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:t));
     """)
     with engine.begin() as conn:
-        rows = conn.execute(query, {"t": table_name}).fetchall()
-    return [{"column": r[0], "type": r[1]} for r in rows]
+        return int(conn.execute(query, {"t": f'"{table_name}"'}).scalar())
@@ -0,0 +1,139 @@
+import os, re, json, logging, unicodedata
+import pandas as pd
+
+# Encoder de tiktoken; se carga en el primer count_tokens (get_encoding puede descargar el BPE).
+# None = todavía no se intentó, False = no disponible
+_ENC = None
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+PROMPT_MAX_ROWS = int(os.getenv("PROMPT_MAX_ROWS", "20"))
+
+# Columnas que siempre van al prompt (fecha y monto definen casi todas las preguntas)
+CORE_COLUMNS = {"date", "amount", "month"}
+
+# Palabras de la pregunta que apuntan a una columna
+COLUMN_HINTS = {
+    "customer": ["cliente", "clientes", "customer"],
+    "salesrep": ["vendedor", "vendedores", "vendedora", "rep", "salesrep"],
+    "producto": ["producto", "productos", "articulo", "articulos", "item"],
+    "descripcion": ["descripcion", "detalle"],
+    "qty": ["cantidad", "cantidades", "unidades", "qty"],
+    "salesprice": ["precio", "precios"],
+    "balance": ["saldo", "saldos", "balance", "deuda"],
+    "class": ["clase", "clases", "categoria", "categorias", "rubro"],
+    "tipocliente": ["tipo de cliente", "tipocliente", "segmento"],
+    "tipodocumento": ["documento", "factura", "facturas", "nota de credito", "tipodocumento"],
+    "num": ["numero", "comprobante"],
+}
+
+
+def _normalize(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s.lower())
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+def _encoder():
+    global _ENC
+    if _ENC is None:
+        try:
+            import tiktoken  #type: ignore
+            _ENC = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # tiktoken es opcional: sin él se estima ~4 caracteres por token
+            logging.info(f"ℹ️ tiktoken no disponible ({e}); se estiman los tokens por longitud.")
+            _ENC = False
+    return _ENC
+
+
+def count_tokens(text: str) -> int:
+    enc = _encoder()
+    if enc:
+        return len(enc.encode(text))
+    return len(text) // 4 + 1
+
+
+def relevant_schema(schema: list, question: str) -> list:
+    """
+    Reduce el esquema a las columnas mencionadas (directa o indirectamente) en la pregunta,
+    más las columnas núcleo. Si no se reconoce ninguna, devuelve el esquema completo.
+    """
+    q = _normalize(question)
+    words = set(re.findall(r"[a-z0-9_]+", q))
+    keep = []
+    matched = False
+    for c in schema:
+        name = c["column"].lower()
+        hints = COLUMN_HINTS.get(name, [])
+        hit = name in words or any((h in q) if " " in h else (h in words) for h in hints)
+        matched = matched or hit
+        if hit or name in CORE_COLUMNS:
+            keep.append(c)
+    return keep if matched else schema
+
+
+def schema_text(schema: list) -> str:
+    """
+    Esquema compacto: una línea 'columna:tipo' por columna.
+    Las columnas de baja cardinalidad agregan sus valores reales: 'columna:tipo = A | B | C'.
+    """
+    lines = []
+    for c in schema:
+        line = f'{c["column"]}:{c["type"]}'
+        if c.get("values"):
+            line += " = " + " | ".join(map(str, c["values"]))
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def catalog_text(tables: list, question: str) -> str:
+    """Una sección por tabla del catálogo con filas estimadas y columnas relevantes."""
+    return "\n\n".join(
+        f'Tabla "{t["name"]}" (~{t["rows"]} filas):\n' + schema_text(relevant_schema(t["columns"], question))
+        for t in tables
+    )
+
+
+def plan_text(plan: dict) -> str:
+    return json.dumps(plan, ensure_ascii=False, separators=(",", ":"))
+
+
+def frame_text(df, max_rows: int = PROMPT_MAX_ROWS) -> str:
+    """
+    Codifica un resultado como CSV compacto. Si el frame tiene más filas que max_rows,
+    agrega la cantidad total y totales precalculados de las columnas numéricas.
+    """
+    if df is None or not hasattr(df, "head"):
+        return "Sin datos o error."
+    if df.empty:
+        return "Sin filas."
+    text = df.head(max_rows).to_csv(index=False, float_format="%.2f").strip()
+    if len(df) > max_rows:
+        nums = df.select_dtypes("number")
+        totals = ", ".join(f"{c}={nums[c].sum():.2f}" for c in nums.columns)
+        text += f"\n(mostrando {max_rows} de {len(df)} filas"
+        text += f"; totales: {totals})" if totals else ")"
+    return text
+
+
+def fit_frame(df, build, budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """
+    Arma el prompt con build(frame_text) y reduce filas a la mitad hasta entrar en el presupuesto.
+    """
+    rows = PROMPT_MAX_ROWS
+    prompt = build(frame_text(df, rows))
+    while count_tokens(prompt) > budget and rows > 1:
+        rows //= 2
+        prompt = build(frame_text(df, rows))
+    if count_tokens(prompt) > budget:
+        logging.warning(f"⚠️ Prompt de {count_tokens(prompt)} tokens excede el presupuesto de {budget}.")
+    return prompt
+
+
+def log_usage(stage: str, resp) -> dict:
+    """Registra tokens de prompt y completion devueltos por OpenAI para una etapa."""
+    usage = getattr(resp, "usage", None)
+    stats = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+    logging.info(f"🔢 Tokens [{stage}]: prompt={stats['prompt_tokens']} completion={stats['completion_tokens']}")
+    return stats
@@ -0,0 +1,109 @@
+import os, re, time, logging, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from mcp_postgres import get_data_version
+
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", "20"))
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "2"))
+QUERY_LOG_SIZE = int(os.getenv("QUERY_LOG_SIZE", "500"))
+QUERY_LOG_WINDOW_S = int(os.getenv("QUERY_LOG_WINDOW_S", str(7 * 24 * 3600)))
+DATA_VERSION_TTL_S = int(os.getenv("DATA_VERSION_TTL_S", "30"))
+
+
+class QueryCache:
+    """
+    Registro de las mini consultas ejecutadas (frecuencia y último uso) y caché "tibia"
+    de resultados precalculados después de cada carga del ETL.
+      - record(): cuenta cada ejecución; el registro se limita a QUERY_LOG_SIZE consultas.
+      - warm(): re-ejecuta las top-N recientes contra los datos nuevos con concurrencia acotada.
+      - run(): sirve desde la caché si el resultado corresponde a la versión actual de los datos.
+    El registro y la caché viven en memoria del proceso: con varios workers de uvicorn cada uno
+    tiene los suyos, y el POST /admin/warmup del ETL calienta solo el worker que lo atiende.
+    Los demás siguen sirviendo correctamente (la versión de datos invalida sus entradas),
+    solo que sin precálculo.
+    """
+
+    def __init__(self, log_size: int = QUERY_LOG_SIZE):
+        self.log_size = log_size
+        self._lock = threading.Lock()
+        self._log = OrderedDict()   # mini normalizada -> {"sql", "count", "last"}
+        self._warm = {}             # mini normalizada -> (versión, DataFrame)
+        self._version = (None, 0.0)  # (versión, timestamp de lectura)
+
+    @staticmethod
+    def normalize(mini: str) -> str:
+        return re.sub(r"\s+", " ", mini.strip().rstrip(";")).lower()
+
+    def record(self, mini: str):
+        key = self.normalize(mini)
+        with self._lock:
+            entry = self._log.pop(key, None) or {"sql": mini.strip(), "count": 0, "last": 0.0}
+            entry["count"] += 1
+            entry["last"] = time.time()
+            self._log[key] = entry
+            while len(self._log) > self.log_size:
+                old, _ = self._log.popitem(last=False)
+                self._warm.pop(old, None)
+
+    def top(self, n: int = WARM_TOP_N, window: int = QUERY_LOG_WINDOW_S) -> list:
+        """Las n mini consultas más frecuentes usadas dentro de la ventana."""
+        since = time.time() - window
+        with self._lock:
+            recent = [e for e in self._log.values() if e["last"] >= since]
+        recent.sort(key=lambda e: (e["count"], e["last"]), reverse=True)
+        return [e["sql"] for e in recent[:n]]
+
+    def version(self, pg, refresh: bool = False):
+        value, read_at = self._version
+        if refresh or value is None or time.time() - read_at > DATA_VERSION_TTL_S:
+            value = get_data_version(pg.table, pg.engine)
+            self._version = (value, time.time())
+        return value
+
+    def run(self, pg, mini: str):
+        """Ejecuta una mini consulta registrándola y sirviendo desde la caché tibia si está vigente."""
+        self.record(mini)
+        key = self.normalize(mini)
+        cached = self._warm.get(key)
+        if cached is not None:
+            try:
+                current = self.version(pg)
+            except Exception:
+                current = None
+            if current is not None and cached[0] == current:
+                logging.info(f"⚡ Resultado precalculado: {mini}")
+                df = cached[1].copy()
+                df.attrs["cache"] = "warm"
+                return df
+        return pg.run_sql(mini)
+
+    def warm(self, pg, n: int = WARM_TOP_N, concurrency: int = WARM_CONCURRENCY) -> dict:
+        """Re-ejecuta las top-N consultas contra los datos frescos y guarda los resultados."""
+        started = time.time()
+        version = self.version(pg, refresh=True)
+        queries = self.top(n)
+
+        def _one(mini):
+            df = pg.run_sql(mini)
+            return mini, df
+
+        warmed = failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for mini, df in pool.map(_one, queries):
+                if "error" in df.columns:
+                    failed += 1
+                    continue
+                with self._lock:
+                    self._warm[self.normalize(mini)] = (version, df)
+                warmed += 1
+        with self._lock:
+            # Lo que no se recalentó corresponde a otra versión: se descarta
+            for key in [k for k, (v, _) in self._warm.items() if v != version]:
+                del self._warm[key]
+        summary = {"version": version, "queries": len(queries), "warmed": warmed, "failed": failed,
+                   "seconds": round(time.time() - started, 2)}
+        logging.info(f"🔥 Warm-up de consultas frecuentes: {summary}")
+        return summary
+
+
+query_cache = QueryCache()
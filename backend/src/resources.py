@@ -0,0 +1,103 @@
+import os, logging, threading
+from openai import OpenAI #type: ignore
+from dotenv import load_dotenv
+from mcp_postgres import PostgresMCP
+from catalog import Catalog, CATALOG_LISTEN
+
+load_dotenv()
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_RETRIES = int(os.getenv("WARMUP_RETRIES", "8"))
+WARMUP_BACKOFF_S = float(os.getenv("WARMUP_BACKOFF_S", "1"))
+
+
+class Resources:
+    """
+    Contenedor de recursos compartidos por todo el proceso (uno por worker de uvicorn).
+    Todo se crea en el primer uso:
+      - PostgresMCP (engine)
+      - Catálogo de tablas (columnas, filas estimadas, valores frecuentes), refrescado por el ETL
+      - Cliente de OpenAI
+    Importar los módulos no toca la DB, así /ping responde aunque Postgres no esté listo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pg = None
+        self._client = None
+        self._catalog = None
+        # Se activa al apagar la API para cortar los reintentos del warm-up
+        self._stop = threading.Event()
+
+    @property
+    def pg(self) -> PostgresMCP:
+        if self._pg is None:
+            with self._lock:
+                if self._pg is None:
+                    self._pg = PostgresMCP()
+        return self._pg
+
+    @property
+    def catalog(self) -> Catalog:
+        """Se carga en el primer uso; si la DB no responde, la excepción se propaga y se reintenta luego."""
+        if self._catalog is None:
+            engine = self.pg.engine
+            with self._lock:
+                if self._catalog is None:
+                    catalog = Catalog(engine).load()
+                    if CATALOG_LISTEN:
+                        catalog.listen()
+                    self._catalog = catalog
+            self._pg.catalog = self._catalog
+        return self._catalog
+
+    @property
+    def engine(self):
+        return self.pg.engine
+
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def schema(self, table: str = None) -> list:
+        return self.catalog.schema(table or self.pg.table)
+
+    def warmup(self, retries: int = WARMUP_RETRIES, backoff: float = WARMUP_BACKOFF_S) -> bool:
+        """
+        Conecta a la DB y carga columnas y esquema, reintentando con backoff exponencial.
+        Devuelve True si quedó todo cargado.
+        """
+        for attempt in range(1, retries + 1):
+            if self._stop.is_set():
+                return False
+            try:
+                self.catalog
+                logging.info(f"🔥 Recursos inicializados (intento {attempt}).")
+                return True
+            except Exception as e:
+                wait = backoff * 2 ** (attempt - 1)
+                logging.warning(f"⏳ DB no disponible (intento {attempt}/{retries}): {e}. Reintento en {wait:.0f}s")
+                if attempt < retries and self._stop.wait(wait):
+                    logging.info("🛑 Warm-up cancelado por apagado.")
+                    return False
+        logging.error("❌ No se pudo inicializar la DB; se reintentará en la primera consulta.")
+        return False
+
+    def stop(self):
+        """Interrumpe el warm-up en curso (la espera entre reintentos termina de inmediato)."""
+        self._stop.set()
+
+    def dispose(self):
+        if self._pg is not None:
+            self._pg.engine.dispose()
+
+
+resources = Resources()
+
+
+def get_resources() -> Resources:
+    return resources
@@ -1,13 +1,17 @@
-import logging, asyncio
+import json, logging, asyncio
+from typing import Optional
 from fastapi import APIRouter, HTTPException #type: ignore
 from pydantic import BaseModel #type: ignore
 from analyzer_ai import analyze_query
+from session_store import sessions
 
 router = APIRouter()
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 class ChatRequest(BaseModel):
     prompt: str
+    session_id: Optional[str] = None
+    previous_result_id: Optional[str] = None
 
 @router.post("/chat")
 async def chat(req: ChatRequest):
@@ -18,12 +22,18 @@ async def chat(req: ChatRequest):
     logging.info(f"💬 Pregunta: {prompt}")
 
     try:
-        result = await asyncio.wait_for(analyze_query(prompt), timeout=90)
+        result = await asyncio.wait_for(analyze_query(prompt, req.session_id, req.previous_result_id), timeout=90)
 
         return {
             "plan": result.get("plan"),
             "sql": result.get("sql"),
             "response": result.get("response"),
+            "guard": result.get("guard"),
+            "usage": result.get("usage"),
+            "source": result.get("source"),
+            "session_id": req.session_id,
+            "result_id": result.get("result_id"),
+            "total_rows": result.get("total_rows", 0),
             "data_preview": result.get("data_preview", [])
         }
 
@@ -33,6 +43,23 @@ async def chat(req: ChatRequest):
         logging.error(f"❌ Error en /chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/results/{result_id}")
+def result_page(result_id: str, offset: int = 0, limit: int = 50):
+    """Página de un resultado cacheado, para no enviar resultados grandes de una sola vez."""
+    entry = sessions.get(result_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Resultado expirado o inexistente.")
+    limit = max(1, min(limit, 1000))
+    df = entry["df"]
+    page = df.iloc[max(offset, 0):max(offset, 0) + limit]
+    return {
+        "result_id": result_id,
+        "offset": offset,
+        "limit": limit,
+        "total_rows": len(df),
+        "rows": json.loads(page.to_json(orient="records", date_format="iso")),
+    }
+
 @router.get("/ping")
 def ping():
     return {"status": "ok", "message": "AI + MCP API operativa"}
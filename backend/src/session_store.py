@@ -0,0 +1,99 @@
+import os, time, uuid, logging, threading
+from collections import OrderedDict
+import pandas as pd
+
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", "1800"))
+SESSION_MAX_FRAMES = int(os.getenv("SESSION_MAX_FRAMES", "3"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class SessionStore:
+    """
+    Resultados recientes en memoria del proceso, identificados por result_id.
+      - Cada sesión de conversación conserva sus últimos SESSION_MAX_FRAMES resultados.
+      - Los resultados sin uso por más de SESSION_TTL_S segundos expiran.
+      - Si el total supera SESSION_MAX_BYTES se descartan los menos usados.
+    Sirve para preguntas de seguimiento y para paginar resultados grandes.
+    """
+
+    def __init__(self, ttl: int = SESSION_TTL_S, max_frames: int = SESSION_MAX_FRAMES, max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._results = OrderedDict()  # result_id -> {"sql", "df", "bytes", "session", "touched"}
+        self._sessions = {}            # session_id -> [result_id, ...] (el más nuevo al final)
+        self._bytes = 0
+
+    @staticmethod
+    def _size(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(deep=True).sum())
+
+    def _drop(self, result_id: str):
+        entry = self._results.pop(result_id, None)
+        if entry is None:
+            return
+        self._bytes -= entry["bytes"]
+        ids = self._sessions.get(entry["session"])
+        if ids is not None:
+            if result_id in ids:
+                ids.remove(result_id)
+            if not ids:
+                self._sessions.pop(entry["session"], None)
+
+    def _expire(self):
+        now = time.time()
+        for rid in [r for r, e in self._results.items() if now - e["touched"] > self.ttl]:
+            self._drop(rid)
+
+    def _touch(self, result_id: str):
+        entry = self._results[result_id]
+        entry["touched"] = time.time()
+        self._results.move_to_end(result_id)
+        return entry
+
+    def put(self, session_id: str, sql: str, df: pd.DataFrame):
+        """Guarda un resultado y devuelve su result_id (None si no se cachea)."""
+        if df is None or "error" in df.columns:
+            return None
+        size = self._size(df)
+        if size > self.max_bytes:
+            logging.info(f"🗃️ Resultado de {size} bytes no se cachea (máximo {self.max_bytes}).")
+            return None
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self._results[result_id] = {"sql": sql, "df": df, "bytes": size, "session": session_id, "touched": time.time()}
+            self._bytes += size
+            if session_id:
+                ids = self._sessions.setdefault(session_id, [])
+                ids.append(result_id)
+                while len(ids) > self.max_frames:
+                    self._drop(ids[0])
+            while self._bytes > self.max_bytes and len(self._results) > 1:
+                self._drop(next(iter(self._results)))
+        return result_id
+
+    def get(self, result_id: str):
+        """Resultado por id ({"sql", "df", ...}) o None si expiró."""
+        if not result_id:
+            return None
+        with self._lock:
+            self._expire()
+            if result_id not in self._results:
+                return None
+            return self._touch(result_id)
+
+    def latest(self, session_id: str):
+        """Último resultado de la sesión o None."""
+        if not session_id:
+            return None
+        with self._lock:
+            self._expire()
+            ids = self._sessions.get(session_id)
+            if not ids:
+                return None
+            return self._touch(ids[-1])
+
+
+sessions = SessionStore()
@@ -1,9 +1,11 @@
 import os
+import re
 import pytest   #type: ignore
 import pandas as pd
 from sqlalchemy import create_engine, text #type: ignore
 from dotenv import load_dotenv
 from mcp_postgres import PostgresMCP
+from mcp_excel import ExcelMCP
 
 # === Cargar variables de entorno ===
 load_dotenv()
@@ -95,6 +97,50 @@ def test_mcp_filtro_fecha(mcp):
     assert not df.empty, "El MCP no devolvió datos en el rango de fechas esperado"
 
 
+def test_mcp_filtros_fecha_como_rango(mcp):
+    """Los filtros de fecha deben ser rangos sobre "Date" para aprovechar particiones e índices"""
+    sql = mcp.build_sql("SELECT SUM(Amount) WHERE Year=2025 AND Month=12")
+    print(sql)
+    # "Date" va sin cast si es timestamp; con ::timestamp si la tabla la tiene como TEXT
+    assert re.search(r'"Date"(::timestamp)? >= DATE \'2025-12-01\' AND "Date"(::timestamp)? < DATE \'2026-01-01\'', sql)
+    assert "\"Year\"" not in sql
+
+
+def test_mcp_filtro_por_valor(mcp):
+    """Las igualdades col='valor' sobre columnas reales deben llegar al WHERE"""
+    sql = mcp.build_sql("SELECT SUM(Amount) WHERE salesrep='Juan Pérez'")
+    print(sql)
+    assert "\"SalesRep\" = 'Juan Pérez'" in sql
+
+
+def test_mcp_filtros_no_soportados(mcp):
+    """OR, <>, comparaciones y columnas inexistentes deben dar error, no un total sin filtrar"""
+    for mini in (
+        "SELECT SUM(Amount) WHERE SalesRep='Juan' OR SalesRep='Ana'",
+        "SELECT SUM(Amount) WHERE SalesRep<>'Juan'",
+        "SELECT SUM(Amount) WHERE Amount > 100",
+        "SELECT SUM(Amount) WHERE Region='North'",
+    ):
+        with pytest.raises(ValueError):
+            mcp.build_sql(mini)
+
+
+def test_mcp_punto_y_coma_final(mcp):
+    """El ";" final no debe quedar pegado a la columna del GROUP BY"""
+    sql = mcp.build_sql("SELECT Customer, SUM(Amount) WHERE Year=2025 GROUP BY Customer;")
+    print(sql)
+    assert sql.endswith('GROUP BY "Customer";') and ";\"" not in sql
+
+
+def test_mcp_from_solo_tablas_permitidas(mcp):
+    """FROM solo admite tablas del catálogo y no se confunde con texto dentro de valores"""
+    with pytest.raises(ValueError):
+        mcp.build_sql("SELECT * FROM pg_authid")
+    sql = mcp.build_sql("SELECT SUM(Amount) WHERE Customer='Sales from north'")
+    print(sql)
+    assert f'FROM "{TABLE}"' in sql and 'FROM "north"' not in sql
+
+
 def test_mcp_agrupado_salesrep(mcp):
     """Verifica agrupación por vendedor"""
     df = mcp.run_sql("SELECT SalesRep, SUM(Amount) GROUP BY SalesRep ORDER BY SUM(Amount) DESC LIMIT 5")
@@ -102,6 +148,59 @@ def test_mcp_agrupado_salesrep(mcp):
     assert not df.empty, "El MCP no devolvió resultados agrupados por SalesRep"
 
 
+def test_mcp_guardia_registra_decision(mcp):
+    """La guardia EXPLAIN debe dejar su decisión en el resultado"""
+    df = mcp.run_sql("SELECT Customer, Amount")
+    guard = df.attrs.get("guard")
+    print(guard)
+    assert guard is not None, "El MCP no registró la decisión de la guardia"
+    assert guard["action"] in ("allowed", "limited", "rejected")
+    if guard["action"] == "limited":
+        assert len(df) <= int(os.getenv("SQL_GUARD_MAX_ROWS", "5000"))
+
+
+def test_mcp_batch_combina_agregados(mcp):
+    """El batch debe combinar agregados con los mismos filtros y devolver lo mismo que por separado"""
+    queries = {
+        "por_mes": "SELECT SUM(Amount) WHERE Year=2025 GROUP BY Month",
+        "por_vendedor": "SELECT SUM(Amount) WHERE Year=2025 GROUP BY SalesRep",
+        "total": "SELECT SUM(Amount) WHERE Year=2025",
+    }
+    results = mcp.run_batch(queries)
+    assert list(results) == list(queries)
+    for key, mini in queries.items():
+        df = results[key]
+        print(key, df.attrs.get("merged"), df.head())
+        assert "error" not in df.columns, f"Error en '{key}': {df.iloc[0].to_dict()}"
+        individual = mcp.run_sql(mini)
+        assert len(df) == len(individual)
+        assert round(float(df["sum"].sum()), 2) == round(float(individual["sum"].sum()), 2)
+
+
+def test_mcp_batch_consultas_no_combinables(mcp):
+    """Las consultas con LIMIT y los grupos de un solo miembro se ejecutan por separado"""
+    queries = {
+        "top": "SELECT SalesRep, SUM(Amount) GROUP BY SalesRep ORDER BY SUM(Amount) DESC LIMIT 5",
+        "solo": "SELECT SUM(Amount) WHERE Year=2025",
+    }
+    results = mcp.run_batch(queries)
+    for key, mini in queries.items():
+        df = results[key]
+        print(key, df.head())
+        assert "error" not in df.columns, f"Error en '{key}': {df.iloc[0].to_dict()}"
+        assert not df.attrs.get("merged", False)
+        assert len(df) == len(mcp.run_sql(mini))
+    assert len(results["top"]) <= 5
+
+
+def test_mcp_batch_una_consulta(mcp):
+    """Un batch de una sola consulta devuelve el mismo resultado que run_sql"""
+    mini = "SELECT SUM(Amount) WHERE Date BETWEEN '2025-01-01' AND '2025-03-31'"
+    df = mcp.run_batch({"q": mini})["q"]
+    assert "error" not in df.columns, df.iloc[0].to_dict()
+    assert round(float(df["sum"].sum()), 2) == round(float(mcp.run_sql(mini)["sum"].sum()), 2)
+
+
 def test_mcp_falla_segura(mcp):
     """Valida que MCP maneje errores SQL correctamente"""
     df = mcp.run_sql("SELECT SUM(Amounnt) WHERE YeaR=2025")  # mal escrito a propósito
@@ -110,3 +209,31 @@ def test_mcp_falla_segura(mcp):
         assert True
     else:
         pytest.fail("El MCP no detectó el error de columna inválida")
+
+
+# -----------------------------------------------------------------------------
+# TESTS DE SEGUIMIENTO EN MEMORIA
+# -----------------------------------------------------------------------------
+def test_excel_mcp_refina_resultado_previo(mcp):
+    """Un resultado previo debe poder filtrarse y reordenarse en memoria"""
+    previo = mcp.run_sql("SELECT SalesRep, SUM(Amount) GROUP BY SalesRep")
+    assert not previo.empty and "error" not in previo.columns
+    rep = str(previo.iloc[0]["SalesRep"])
+    filtrado = ExcelMCP(df=previo).run_sql(f"SELECT * WHERE SalesRep='{rep.upper()}'")
+    print(filtrado)
+    assert len(filtrado) >= 1
+    assert (filtrado["SalesRep"].astype(str).str.lower() == rep.lower()).all()
+    ordenado = ExcelMCP(df=previo).run_sql("SELECT * ORDER BY sum DESC LIMIT 3")
+    assert len(ordenado) <= 3
+    assert ordenado["sum"].is_monotonic_decreasing
+    # Filtros que no se pueden aplicar en memoria → error (analyze_query cae a la BD)
+    with pytest.raises(ValueError):
+        ExcelMCP(df=previo).run_sql("SELECT * WHERE Region='North'")
+    with pytest.raises(ValueError):
+        ExcelMCP(df=previo).run_sql("SELECT * WHERE Year=2025")
+    with pytest.raises(ValueError):
+        ExcelMCP(df=previo).run_sql("SELECT * WHERE sum > 100")
+    # "Month" de Postgres es texto ('2025-02'): Month=2 no se puede aplicar en memoria
+    por_mes = mcp.run_sql("SELECT SUM(Amount) WHERE Year=2025 GROUP BY Month")
+    with pytest.raises(ValueError):
+        ExcelMCP(df=por_mes).run_sql("SELECT * WHERE Month=2")
@@ -1,5 +1,5 @@
 CREATE TABLE IF NOT EXISTS ventas (
-    "Date" TIMESTAMP,
+    "Date" TIMESTAMP NOT NULL,
     "Customer" TEXT,
     "TipoDocumento" TEXT,
     "Num" TEXT,
@@ -14,5 +14,9 @@ CREATE TABLE IF NOT EXISTS ventas (
     "TipoCliente" TEXT,
     "ID" INTEGER,
     "Month" TEXT,
-    "row_hash" TEXT PRIMARY KEY
-);
\ No newline at end of file
+    "row_hash" TEXT,
+    PRIMARY KEY ("row_hash", "Date")
+) PARTITION BY RANGE ("Date");
+
+-- Las particiones mensuales (ventas_YYYY_MM) las crea el ETL al cargar cada mes.
+CREATE INDEX IF NOT EXISTS ventas_date_idx ON ventas USING BRIN ("Date");
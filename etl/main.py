@@ -9,8 +9,11 @@ import logging
 import datetime
 import pandas as pd
 import psycopg2
+import psycopg2.extras
 import pyodbc #type: ignore
 import hashlib
+import urllib.request
+from openpyxl import load_workbook
 from dotenv import load_dotenv
 from apscheduler.schedulers.blocking import BlockingScheduler #type: ignore
 
@@ -34,48 +37,251 @@ POSTGRES_CONFIG = {
 }
 
 TARGET_TABLE = os.getenv("POSTGRES_TARGET_TABLE", "ventas")
+CHECKSUM_TABLE = os.getenv("POSTGRES_CHECKSUM_TABLE", f"{TARGET_TABLE}_checksums")
+
+# Origen: "sqlserver" ([Sheet1$] vía ODBC) o "xlsx" (lectura directa en streaming de XLSX_PATH)
+ETL_SOURCE = os.getenv("ETL_SOURCE", "sqlserver").lower()
+XLSX_PATH = os.getenv("XLSX_PATH", "/app/data/data.xlsx")
+ETL_BATCH_SIZE = int(os.getenv("ETL_BATCH_SIZE", "5000"))
+
+# "incremental": inserta filas nuevas (dedup por hash).
+# "reconcile": compara checksums por mes y re-sincroniza solo los meses que difieren.
+ETL_MODE = os.getenv("ETL_MODE", "incremental").lower()
+
+# Particionado mensual por "Date" (RANGE) con índice BRIN o B-tree sobre "Date"
+PG_PARTITIONED = os.getenv("PG_PARTITIONED", "true").lower() in ("1", "true", "yes")
+PG_DATE_INDEX = os.getenv("PG_DATE_INDEX", "brin").lower()
+# Tipos fijos de la tabla particionada (los mismos que etl/init.sql). El resto de las columnas
+# va como TEXT: inferirlas de un solo lote fallaría con lotes posteriores de otro tipo.
+PG_COLUMN_TYPES = {
+    "Qty": "DOUBLE PRECISION",
+    "Amount": "DOUBLE PRECISION",
+    "Balance": "DOUBLE PRECISION",
+    "ID": "INTEGER",
+}
+# Meses a conservar adjuntos; las particiones más viejas se desacoplan (0 = nunca)
+PG_RETENTION_MONTHS = int(os.getenv("PG_RETENTION_MONTHS", "0"))
+
+# Al terminar cada carga se avisa al backend para recalentar las consultas frecuentes ("" = desactivado)
+WARMUP_URL = os.getenv("WARMUP_URL", "")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Estilo de CONVERT con el que SQL Server interpreta [Date] (103 = dd/mm/yyyy).
+# El mismo criterio (día primero o no) se usa en pandas para que el mes coincida en ambos lados.
+SOURCE_DATE_STYLE = int(os.getenv("SOURCE_DATE_STYLE", "103"))
+SOURCE_DAYFIRST = SOURCE_DATE_STYLE in (3, 4, 5, 103, 104, 105)
+
+# Mes (yyyy-MM) calculado del lado de SQL Server, usado para agrupar y filtrar particiones
+SOURCE_MONTH_EXPR = f"CONVERT(CHAR(7), TRY_CONVERT(DATE, [Date], {SOURCE_DATE_STYLE}), 126)"
+
+def sql_server_conn_str():
+    return (
+        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+        f'SERVER={SQL_CONFIG["host"]},{SQL_CONFIG["port"]};'
+        f'DATABASE={SQL_CONFIG["database"]};'
+        f'UID={SQL_CONFIG["user"]};'
+        f'PWD={SQL_CONFIG["password"]}'
+    )
+
+def pg_connect():
+    return psycopg2.connect(
+        host=POSTGRES_CONFIG["host"],
+        port=POSTGRES_CONFIG["port"],
+        database=POSTGRES_CONFIG["database"],
+        user=POSTGRES_CONFIG["user"],
+        password=POSTGRES_CONFIG["password"]
+    )
 
 def hash_row(row):
     concat = "|".join([str(row[col]) for col in row.index])
     return hashlib.sha256(concat.encode("utf-8")).hexdigest()
 
-def ensure_pg_table(conn, df: pd.DataFrame):
+def parse_dates(series: pd.Series) -> pd.Series:
+    """Interpreta "Date" con el mismo estilo que SOURCE_MONTH_EXPR en SQL Server."""
+    return pd.to_datetime(series, errors="coerce", dayfirst=SOURCE_DAYFIRST)
+
+def prepare_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Deriva Month y row_hash igual para todos los modos de carga."""
+    df["Month"] = parse_dates(df["Date"]).dt.strftime("%Y-%m")
+    df["row_hash"] = df.apply(hash_row, axis=1)
+    return df
+
+def hashes_checksum(hashes) -> str:
+    """Checksum agregado de un conjunto de row_hash (mismo cálculo que en Postgres)."""
+    return hashlib.md5("".join(sorted(hashes)).encode("utf-8")).hexdigest()
+
+def month_bounds(month: str):
+    """'2025-09' -> (date(2025, 9, 1), date(2025, 10, 1))."""
+    start = datetime.datetime.strptime(month, "%Y-%m").date()
+    end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return start, end
+
+def partition_name(month: str) -> str:
+    return f"{TARGET_TABLE}_{month.replace('-', '_')}"
+
+def table_state(cur):
+    """Devuelve (relkind, tipo de "Date") de la tabla destino, o (None, None) si no existe."""
+    cur.execute('''
+    SELECT c.relkind,
+           (SELECT data_type FROM information_schema.columns
+            WHERE table_name = %s AND column_name = 'Date')
+    FROM pg_class c
+    WHERE c.oid = to_regclass(%s)
+    ''', (TARGET_TABLE, f'"{TARGET_TABLE}"'))
+    row = cur.fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+def ensure_partitions(cur, months):
+    # Los meses fuera de retención no se recrean: sus particiones ya se desacoplaron
+    cutoff = retention_cutoff()
+    for month in sorted({m for m in months if isinstance(m, str) and m != "NaN" and m >= cutoff}):
+        start, end = month_bounds(month)
+        cur.execute(f'''
+        CREATE TABLE IF NOT EXISTS "{partition_name(month)}"
+        PARTITION OF "{TARGET_TABLE}"
+        FOR VALUES FROM ('{start}') TO ('{end}');
+        ''')
+
+def ensure_date_index(cur):
+    # Definido sobre la tabla padre: Postgres lo replica en cada partición nueva
+    method = "BRIN" if PG_DATE_INDEX == "brin" else "BTREE"
+    cur.execute(f'CREATE INDEX IF NOT EXISTS "{TARGET_TABLE}_date_idx" ON "{TARGET_TABLE}" USING {method} ("Date")')
+
+def migrate_to_partitioned(cur):
+    """Convierte una tabla existente sin particionar, copiando sus filas a particiones mensuales."""
+    legacy = f"{TARGET_TABLE}_legacy"
+    logging.info(f"Migrando {TARGET_TABLE} a tabla particionada por mes...")
+    cur.execute(f'ALTER TABLE "{TARGET_TABLE}" RENAME TO "{legacy}"')
+    cur.execute(f'ALTER TABLE "{legacy}" DROP CONSTRAINT IF EXISTS "{TARGET_TABLE}_pkey"')
+    cur.execute(f'CREATE TABLE "{TARGET_TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE ("Date")')
+    cur.execute(f'ALTER TABLE "{TARGET_TABLE}" ADD PRIMARY KEY ("row_hash", "Date")')
+    cur.execute(f'''SELECT DISTINCT to_char("Date", 'YYYY-MM') FROM "{legacy}" WHERE "Date" IS NOT NULL''')
+    ensure_partitions(cur, [r[0] for r in cur.fetchall()])
+    cur.execute(f'INSERT INTO "{TARGET_TABLE}" SELECT * FROM "{legacy}" WHERE "Date" IS NOT NULL ON CONFLICT DO NOTHING')
+    cur.execute(f'SELECT COUNT(*) FROM "{legacy}" WHERE "Date" IS NULL')
+    orphans = cur.fetchone()[0]
+    if orphans:
+        logging.warning(f"{orphans} filas sin fecha quedan en {legacy} para revisión manual.")
+    else:
+        cur.execute(f'DROP TABLE "{legacy}"')
+    logging.info(f"Migración de {TARGET_TABLE} completada.")
+
+def is_partitioned(conn) -> bool:
+    """Estado real de la tabla destino (PG_PARTITIONED no alcanza: una tabla con "Date" TEXT no se migra)."""
+    with conn.cursor() as cur:
+        return table_state(cur)[0] == "p"
+
+def ensure_pg_table(conn, df: pd.DataFrame) -> bool:
+    """Crea o migra la tabla destino. Devuelve True si quedó particionada."""
     cols = df.columns.tolist()
     col_defs = []
     for c in cols:
         if c == "row_hash":
-            col_defs.append('"row_hash" TEXT PRIMARY KEY')
+            col_defs.append('"row_hash" TEXT' if PG_PARTITIONED else '"row_hash" TEXT PRIMARY KEY')
+        elif c == "Date" and PG_PARTITIONED:
+            col_defs.append('"Date" TIMESTAMP NOT NULL')
+        elif PG_PARTITIONED:
+            col_defs.append(f'"{c}" {PG_COLUMN_TYPES.get(c, "TEXT")}')
         else:
             col_defs.append(f'"{c}" TEXT')
+    if PG_PARTITIONED:
+        # La PK de una tabla particionada debe incluir la clave de partición
+        col_defs.append('PRIMARY KEY ("row_hash", "Date")')
     ddl = f'''
     CREATE TABLE IF NOT EXISTS "{TARGET_TABLE}" (
         {", ".join(col_defs)}
-    );
+    ){' PARTITION BY RANGE ("Date")' if PG_PARTITIONED else ''};
     '''
     with conn.cursor() as cur:
+        relkind, date_type = table_state(cur)
+        if PG_PARTITIONED and relkind == "r":
+            if date_type and date_type.startswith(("timestamp", "date")):
+                migrate_to_partitioned(cur)
+            else:
+                logging.warning(f'No se puede particionar {TARGET_TABLE}: "Date" es {date_type}. Se usa la tabla sin particionar.')
         cur.execute(ddl)
+        partitioned = table_state(cur)[0] == "p"
+        if partitioned:
+            ensure_partitions(cur, df["Month"].dropna().unique())
+            ensure_date_index(cur)
     conn.commit()
     logging.info(f"Tabla {TARGET_TABLE} verificada/creada.")
+    return partitioned
+
+def publish_catalog(conn):
+    """
+    Actualiza estadísticas (filas estimadas, valores frecuentes) y avisa al backend
+    para que refresque su catálogo de la tabla.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f'ANALYZE "{TARGET_TABLE}"')
+        cur.execute("SELECT pg_notify('catalog_refresh', %s)", (TARGET_TABLE,))
+    conn.commit()
+    logging.info(f"Catálogo de {TARGET_TABLE} publicado.")
+
+def detach_old_partitions(conn):
+    """
+    Desacopla las particiones anteriores a PG_RETENTION_MONTHS.
+    Quedan como tablas independientes para archivar o borrar sin un DELETE masivo.
+    """
+    if not PG_PARTITIONED or PG_RETENTION_MONTHS <= 0:
+        return
+    cutoff = retention_cutoff()
+    detached = 0
+    with conn.cursor() as cur:
+        cur.execute('''
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ''', (f'"{TARGET_TABLE}"',))
+        for (name,) in cur.fetchall():
+            month = name[len(TARGET_TABLE) + 1:].replace("_", "-")
+            if month < cutoff:
+                cur.execute(f'ALTER TABLE "{TARGET_TABLE}" DETACH PARTITION "{name}"')
+                logging.info(f"Partición {name} desacoplada (archivable).")
+                detached += 1
+    conn.commit()
+    if detached:
+        publish_catalog(conn)
+
+def retention_cutoff() -> str:
+    """Primer mes (yyyy-MM) que se conserva adjunto, o '' si no hay retención."""
+    if PG_RETENTION_MONTHS <= 0:
+        return ""
+    today = datetime.date.today()
+    idx = today.year * 12 + today.month - 1 - (PG_RETENTION_MONTHS - 1)
+    return f"{idx // 12:04d}-{idx % 12 + 1:02d}"
+
+def rows_for_pg(df: pd.DataFrame, partitioned: bool) -> pd.DataFrame:
+    """
+    Adapta el DataFrame al destino: si la tabla está particionada, "Date" va como timestamp
+    y se omiten las filas sin fecha; si no, las filas quedan como en el origen.
+    """
+    if not partitioned:
+        return df
+    df = df.copy()
+    df["Date"] = parse_dates(df["Date"])
+    invalid = df["Date"].isna()
+    if invalid.any():
+        logging.warning(f"{int(invalid.sum())} filas sin fecha válida se omiten (la tabla está particionada por Date).")
+    archived = df["Month"].astype(str) < retention_cutoff()
+    if archived.any():
+        logging.info(f"{int(archived.sum())} filas de meses desacoplados se omiten.")
+    return df[~invalid & ~archived]
 
 def fetch_data():
     start = datetime.datetime.now() - datetime.timedelta(hours=4)
     end = datetime.datetime.now()
     logging.info(f"Extrayendo datos desde {start.date()} hasta {end.date()}")
 
-    conn_str = (
-        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-        f'SERVER={SQL_CONFIG["host"]},{SQL_CONFIG["port"]};'
-        f'DATABASE={SQL_CONFIG["database"]};'
-        f'UID={SQL_CONFIG["user"]};'
-        f'PWD={SQL_CONFIG["password"]}'
-    )
-    with pyodbc.connect(conn_str, timeout=30) as conn:
+    with pyodbc.connect(sql_server_conn_str(), timeout=30) as conn:
         query = f'''
         SELECT *
         FROM [Sheet1$]
         WHERE 1=1
---          AND TRY_CONVERT(DATE, [Date], 103) >= '{start.date()}'
---          AND TRY_CONVERT(DATE, [Date], 103) < '{end.date()}'
+--          AND TRY_CONVERT(DATE, [Date], {SOURCE_DATE_STYLE}) >= '{start.date()}'
+--          AND TRY_CONVERT(DATE, [Date], {SOURCE_DATE_STYLE}) < '{end.date()}'
         '''
         df = pd.read_sql(query, conn)
 
@@ -83,43 +289,32 @@ def fetch_data():
         logging.info("Sin nuevas filas.")
         return None
 
-    df["Month"] = pd.to_datetime(df["Date"], errors='coerce').dt.strftime("%Y-%m")
-    df["row_hash"] = df.apply(hash_row, axis=1)
+    df = prepare_df(df)
     logging.info(f"{len(df)} filas leídas.")
     return df
 
 def initial_diagnostics():
     logging.info("===== Diagnóstico inicial =====")
 
-    try:
-        # SQL Server
-        conn_str = (
-            f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-            f'SERVER={SQL_CONFIG["host"]},{SQL_CONFIG["port"]};'
-            f'DATABASE={SQL_CONFIG["database"]};'
-            f'UID={SQL_CONFIG["user"]};'
-            f'PWD={SQL_CONFIG["password"]}'
-        )
-        with pyodbc.connect(conn_str, timeout=30) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM [Sheet1$]")
-            result = cursor.fetchone()
-            count = result[0] if result else 0
-            cursor.execute("SELECT TOP 1 * FROM [Sheet1$]")
-            columns = [column[0] for column in cursor.description]
-            logging.info(f"Origen [Sheet1$] columnas: {columns}")
-            logging.info(f"Origen [Sheet1$] cantidad de registros: {count}")
-    except Exception as e:
-        logging.error(f"Error al conectar con SQL Server: {e}")
+    if ETL_SOURCE == "xlsx":
+        logging.info(f"Origen xlsx: {XLSX_PATH} (SQL Server no se consulta)")
+    else:
+        try:
+            # SQL Server
+            with pyodbc.connect(sql_server_conn_str(), timeout=30) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM [Sheet1$]")
+                result = cursor.fetchone()
+                count = result[0] if result else 0
+                cursor.execute("SELECT TOP 1 * FROM [Sheet1$]")
+                columns = [column[0] for column in cursor.description]
+                logging.info(f"Origen [Sheet1$] columnas: {columns}")
+                logging.info(f"Origen [Sheet1$] cantidad de registros: {count}")
+        except Exception as e:
+            logging.error(f"Error al conectar con SQL Server: {e}")
 
     try:
-        conn = psycopg2.connect(
-            host=POSTGRES_CONFIG["host"],
-            port=POSTGRES_CONFIG["port"],
-            database=POSTGRES_CONFIG["database"],
-            user=POSTGRES_CONFIG["user"],
-            password=POSTGRES_CONFIG["password"]
-        )
+        conn = pg_connect()
         cursor = conn.cursor()
         cursor.execute(f"SELECT COUNT(*) FROM \"{TARGET_TABLE}\"")
         result = cursor.fetchone()
@@ -135,35 +330,269 @@ def initial_diagnostics():
 
     logging.info("===== Fin diagnóstico =====")
 
-def load_to_pg(df: pd.DataFrame):
-    conn = psycopg2.connect(
-        host=POSTGRES_CONFIG["host"],
-        port=POSTGRES_CONFIG["port"],
-        database=POSTGRES_CONFIG["database"],
-        user=POSTGRES_CONFIG["user"],
-        password=POSTGRES_CONFIG["password"]
-    )
-    ensure_pg_table(conn, df)
-
+def insert_rows(cur, df: pd.DataFrame):
     cols = df.columns.tolist()
-    placeholders = ", ".join(["%s"] * len(cols))
     insert_sql = f'''
     INSERT INTO "{TARGET_TABLE}" ({", ".join([f'"{c}"' for c in cols])})
-    VALUES ({placeholders})
-    ON CONFLICT ("row_hash") DO NOTHING;
+    VALUES %s
+    ON CONFLICT DO NOTHING;
     '''
+    # NaN/NaT (celdas vacías) van como NULL: psycopg2 enviaría 'NaN'::float, que falla en INTEGER
+    rows = list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+    psycopg2.extras.execute_values(cur, insert_sql, rows, page_size=1000)
+
+def load_to_pg(df: pd.DataFrame):
+    conn = pg_connect()
+    df = rows_for_pg(df, ensure_pg_table(conn, df))
+
     with conn.cursor() as cur:
-        for _, row in df.iterrows():
-            cur.execute(insert_sql, tuple(row))
+        insert_rows(cur, df)
     conn.commit()
+    publish_catalog(conn)
     conn.close()
     logging.info(f"{len(df)} filas procesadas (con deduplicación por hash).")
 
+# ============================================
+# 📄 CARGA DIRECTA DESDE XLSX (streaming)
+# ============================================
+def iter_xlsx_batches(path: str, batch_size: int = ETL_BATCH_SIZE):
+    """
+    Lee la primera hoja fila por fila (openpyxl read_only) y entrega DataFrames de batch_size filas.
+    La memoria queda acotada al tamaño del lote, no al de la planilla.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Posición de cada encabezado no vacío: las celdas se toman por índice, no por orden
+        keep = [(i, str(h).strip()) for i, h in enumerate(header) if h is not None]
+        columns = [name for _, name in keep]
+        batch = []
+        for row in rows:
+            if row is None:
+                continue
+            values = tuple(row[i] if i < len(row) else None for i, _ in keep)
+            if all(v is None for v in values):
+                continue
+            batch.append(values)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        wb.close()
+
+def load_xlsx(path: str = XLSX_PATH):
+    """Carga el xlsx a Postgres por lotes, con la misma derivación de Month y row_hash."""
+    logging.info(f"Leyendo {path} en lotes de {ETL_BATCH_SIZE} filas...")
+    conn = pg_connect()
+    total = 0
+    try:
+        for batch in iter_xlsx_batches(path):
+            df = prepare_df(batch)
+            df = rows_for_pg(df, ensure_pg_table(conn, df))
+            with conn.cursor() as cur:
+                insert_rows(cur, df)
+            conn.commit()
+            total += len(df)
+            logging.info(f"{total} filas procesadas desde xlsx...")
+        detach_old_partitions(conn)
+        if total:
+            publish_catalog(conn)
+    finally:
+        conn.close()
+    logging.info(f"{total} filas procesadas desde xlsx (con deduplicación por hash).")
+
+# ============================================
+# 🔁 RECONCILIACIÓN POR MES (checksums)
+# ============================================
+def ensure_checksum_table(conn):
+    """Estado de la última sincronización de cada mes."""
+    ddl = f'''
+    CREATE TABLE IF NOT EXISTS "{CHECKSUM_TABLE}" (
+        "Month" TEXT PRIMARY KEY,
+        "source_rows" BIGINT,
+        "source_checksum" BIGINT,
+        "pg_rows" BIGINT,
+        "pg_checksum" TEXT,
+        "synced_at" TIMESTAMP
+    );
+    '''
+    with conn.cursor() as cur:
+        cur.execute(ddl)
+    conn.commit()
+
+def source_month_checksums() -> dict:
+    """
+    Checksum agregado por mes calculado en SQL Server (sin traer filas).
+    Devuelve {mes: (cantidad, checksum)}.
+    """
+    query = f'''
+    SELECT {SOURCE_MONTH_EXPR} AS Month,
+           COUNT(*) AS n,
+           CHECKSUM_AGG(BINARY_CHECKSUM(*)) AS chk
+    FROM [Sheet1$]
+    GROUP BY {SOURCE_MONTH_EXPR}
+    '''
+    with pyodbc.connect(sql_server_conn_str(), timeout=30) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    result = {}
+    for month, n, chk in rows:
+        if month is None:
+            logging.warning(f"{n} filas de origen sin fecha válida: no se reconcilian por mes.")
+            continue
+        result[month] = (int(n), int(chk or 0))
+    return result
+
+def pg_month_checksums(conn) -> dict:
+    """
+    Checksum agregado por mes de los row_hash ya cargados en Postgres.
+    Devuelve {mes: (cantidad, md5 de los hashes ordenados)}.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", (f'"{TARGET_TABLE}"',))
+        if cur.fetchone()[0] is None:
+            return {}
+    query = f'''
+    SELECT "Month", COUNT(*), md5(string_agg("row_hash", '' ORDER BY "row_hash" COLLATE "C"))
+    FROM "{TARGET_TABLE}"
+    WHERE "Month" IS NOT NULL AND "Month" <> 'NaN'
+    GROUP BY "Month"
+    '''
+    with conn.cursor() as cur:
+        cur.execute(query)
+        return {m: (int(n), chk) for m, n, chk in cur.fetchall()}
+
+def stored_month_checksums(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT "Month", "source_rows", "source_checksum", "pg_rows", "pg_checksum" FROM "{CHECKSUM_TABLE}"')
+        return {r[0]: ((r[1], r[2]), (r[3], r[4])) for r in cur.fetchall()}
+
+def months_to_resync(source: dict, pg: dict, stored: dict) -> list:
+    """
+    Un mes se re-sincroniza si cambió en el origen desde la última sincronización,
+    si Postgres ya no coincide con lo cargado entonces, o si existe de un solo lado.
+    """
+    cutoff = retention_cutoff()
+    changed = []
+    for month in sorted(set(source) | set(pg)):
+        if month < cutoff:
+            # Meses fuera de retención: sus particiones ya se desacoplaron
+            continue
+        if month not in source or month not in stored:
+            changed.append(month)
+            continue
+        last_source, last_pg = stored[month]
+        if source[month] != last_source or pg.get(month) != last_pg:
+            changed.append(month)
+    return changed
+
+def fetch_month(month: str) -> pd.DataFrame:
+    query = f'''
+    SELECT *
+    FROM [Sheet1$]
+    WHERE {SOURCE_MONTH_EXPR} = ?
+    '''
+    with pyodbc.connect(sql_server_conn_str(), timeout=30) as conn:
+        df = pd.read_sql(query, conn, params=[month])
+    return prepare_df(df) if not df.empty else df
+
+def resync_month(conn, month: str, source_state):
+    """Borra los hashes obsoletos del mes e inserta los nuevos, en una sola transacción."""
+    df = fetch_month(month) if source_state is not None else pd.DataFrame()
+    if not df.empty:
+        partitioned = ensure_pg_table(conn, df)
+        df = rows_for_pg(df, partitioned)
+    else:
+        partitioned = is_partitioned(conn)
+    # El rango sobre "Date" permite que Postgres toque una sola partición ("Date" es timestamp solo si está particionada)
+    start, end = month_bounds(month)
+    month_filter = '"Month" = %s AND "Date" >= %s AND "Date" < %s' if partitioned else '"Month" = %s'
+    month_params = (month, start, end) if partitioned else (month,)
+    with conn.cursor() as cur:
+        if df.empty:
+            cur.execute(f'DELETE FROM "{TARGET_TABLE}" WHERE {month_filter}', month_params)
+            deleted = cur.rowcount
+            cur.execute(f'DELETE FROM "{CHECKSUM_TABLE}" WHERE "Month" = %s', (month,))
+            inserted = 0
+        else:
+            hashes = df["row_hash"].tolist()
+            cur.execute(
+                f'DELETE FROM "{TARGET_TABLE}" WHERE {month_filter} AND NOT ("row_hash" = ANY(%s))',
+                (*month_params, hashes),
+            )
+            deleted = cur.rowcount
+            insert_rows(cur, df)
+            inserted = len(df)
+            cur.execute(f'''
+            INSERT INTO "{CHECKSUM_TABLE}" ("Month", "source_rows", "source_checksum", "pg_rows", "pg_checksum", "synced_at")
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            ON CONFLICT ("Month") DO UPDATE SET
+                "source_rows" = EXCLUDED."source_rows",
+                "source_checksum" = EXCLUDED."source_checksum",
+                "pg_rows" = EXCLUDED."pg_rows",
+                "pg_checksum" = EXCLUDED."pg_checksum",
+                "synced_at" = EXCLUDED."synced_at";
+            ''', (month, source_state[0], source_state[1], len(set(hashes)), hashes_checksum(set(hashes))))
+    conn.commit()
+    logging.info(f"Mes {month} re-sincronizado: {deleted} filas obsoletas borradas, {inserted} filas procesadas.")
+
+def reconcile():
+    """
+    Sincroniza updates y deletes del origen comparando checksums por mes.
+    Solo los meses con diferencias se vuelven a leer desde SQL Server.
+    """
+    conn = pg_connect()
+    try:
+        ensure_checksum_table(conn)
+        source = source_month_checksums()
+        pg = pg_month_checksums(conn)
+        stored = stored_month_checksums(conn)
+        changed = months_to_resync(source, pg, stored)
+        logging.info(f"Reconciliación: {len(changed)} de {len(set(source) | set(pg))} meses con diferencias.")
+        for month in changed:
+            resync_month(conn, month, source.get(month))
+        detach_old_partitions(conn)
+        if changed:
+            publish_catalog(conn)
+    finally:
+        conn.close()
+
+def trigger_warmup():
+    # Sin token el backend tiene el endpoint deshabilitado
+    if not WARMUP_URL or not ADMIN_TOKEN:
+        return
+    try:
+        req = urllib.request.Request(WARMUP_URL, data=b"", method="POST", headers={"X-Admin-Token": ADMIN_TOKEN})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            logging.info(f"Warm-up del backend solicitado: {resp.read().decode('utf-8')}")
+    except Exception as e:
+        logging.warning(f"No se pudo solicitar el warm-up del backend: {e}")
+
 def job():
     try:
+        if ETL_SOURCE == "xlsx":
+            load_xlsx()
+            trigger_warmup()
+            return
+        if ETL_MODE == "reconcile":
+            reconcile()
+            trigger_warmup()
+            return
         df = fetch_data()
         if df is not None:
             load_to_pg(df)
+            conn = pg_connect()
+            try:
+                detach_old_partitions(conn)
+            finally:
+                conn.close()
+            trigger_warmup()
         else:
             logging.info("No hay datos nuevos para insertar.")
     except Exception as e:
@@ -0,0 +1,100 @@
+import datetime
+import hashlib
+import pytest   #type: ignore
+import pandas as pd
+from openpyxl import Workbook
+import main
+
+
+class FixedDate(datetime.date):
+    """date.today() fijo para probar la retención."""
+    @classmethod
+    def today(cls):
+        return cls(2025, 3, 15)
+
+
+# -----------------------------------------------------------------------------
+# CHECKSUMS Y RECONCILIACIÓN
+# -----------------------------------------------------------------------------
+def test_hashes_checksum_no_depende_del_orden():
+    hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(50)]
+    assert main.hashes_checksum(hashes) == main.hashes_checksum(reversed(hashes))
+    assert main.hashes_checksum(hashes) != main.hashes_checksum(hashes[1:])
+
+
+def test_hashes_checksum_coincide_con_postgres():
+    """Mismo cálculo que pg_month_checksums: md5(string_agg(... ORDER BY row_hash COLLATE "C"))"""
+    hashes = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(200)]
+    conn = main.pg_connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                '''SELECT md5(string_agg(h, '' ORDER BY h COLLATE "C")) FROM unnest(%s::text[]) AS h''',
+                (hashes,),
+            )
+            assert cur.fetchone()[0] == main.hashes_checksum(set(hashes))
+    finally:
+        conn.close()
+
+
+def test_months_to_resync(monkeypatch):
+    monkeypatch.setattr(main, "PG_RETENTION_MONTHS", 0)
+    source = {"2025-01": (10, 111), "2025-02": (5, 222), "2025-03": (7, 333)}
+    pg = {"2025-01": (10, "a"), "2025-02": (5, "b"), "2024-12": (3, "c")}
+    stored = {
+        "2025-01": ((10, 111), (10, "a")),   # sin cambios
+        "2025-02": ((5, 999), (5, "b")),     # cambió en el origen
+    }
+    # 2025-03 solo en el origen y 2024-12 solo en Postgres también se re-sincronizan
+    assert main.months_to_resync(source, pg, stored) == ["2024-12", "2025-02", "2025-03"]
+
+    stored["2025-02"] = ((5, 222), (4, "x"))  # Postgres ya no coincide con lo cargado
+    assert "2025-02" in main.months_to_resync(source, pg, stored)
+
+
+def test_months_to_resync_respeta_retencion(monkeypatch):
+    monkeypatch.setattr(main.datetime, "date", FixedDate)
+    monkeypatch.setattr(main, "PG_RETENTION_MONTHS", 2)
+    source = {"2025-01": (1, 1), "2025-02": (1, 1)}
+    assert main.months_to_resync(source, {}, {}) == ["2025-02"]
+
+
+def test_retention_cutoff(monkeypatch):
+    monkeypatch.setattr(main.datetime, "date", FixedDate)
+    monkeypatch.setattr(main, "PG_RETENTION_MONTHS", 0)
+    assert main.retention_cutoff() == ""
+    monkeypatch.setattr(main, "PG_RETENTION_MONTHS", 1)
+    assert main.retention_cutoff() == "2025-03"
+    monkeypatch.setattr(main, "PG_RETENTION_MONTHS", 3)
+    assert main.retention_cutoff() == "2025-01"
+    monkeypatch.setattr(main, "PG_RETENTION_MONTHS", 4)
+    assert main.retention_cutoff() == "2024-12"
+
+
+def test_prepare_df_mes_con_estilo_del_origen(monkeypatch):
+    """Con el estilo 103 (dd/mm/yyyy) el mes debe ser el mismo que calcula SQL Server"""
+    monkeypatch.setattr(main, "SOURCE_DAYFIRST", True)
+    df = main.prepare_df(pd.DataFrame({"Date": ["05/01/2025", "13/02/2025"], "Amount": [1, 2]}))
+    assert df["Month"].tolist() == ["2025-01", "2025-02"]
+
+
+# -----------------------------------------------------------------------------
+# LECTURA DE XLSX
+# -----------------------------------------------------------------------------
+def test_iter_xlsx_batches_respeta_encabezados(tmp_path):
+    """Una columna sin encabezado no debe correr los valores de las siguientes"""
+    path = tmp_path / "data.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Date", None, "Customer", "Amount"])
+    for i in range(5):
+        ws.append([datetime.datetime(2025, 1, i + 1), f"basura{i}", f"Cliente {i}", i * 10])
+    ws.append([None, "solo basura", None, None])   # fila vacía en las columnas con encabezado
+    wb.save(path)
+
+    batches = list(main.iter_xlsx_batches(str(path), batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    df = pd.concat(batches, ignore_index=True)
+    assert df.columns.tolist() == ["Date", "Customer", "Amount"]
+    assert df["Customer"].tolist() == [f"Cliente {i}" for i in range(5)]
+    assert df["Amount"].tolist() == [0, 10, 20, 30, 40]
@@ -1,11 +1,23 @@
 import streamlit as st  # type: ignore
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import uuid
 
 # ==============================
 # CONFIGURACIÓN
 # ==============================
 API_URL = os.getenv("API_URL", "http://api:8000")
+# (conexión, lectura) en segundos; /chat incluye planificación y resumen con el modelo
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT", "5")), float(os.getenv("API_READ_TIMEOUT", "100")))
+# Las respuestas llevan un result_id que el backend descarta a los SESSION_TTL_S: no cachear más que eso
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", "1800"))
+ANSWER_CACHE_TTL = min(int(os.getenv("ANSWER_CACHE_TTL", "3600")), SESSION_TTL_S)
+# Respuestas de error que el backend devuelve con 200 (ver analyzer_ai.analyze_query)
+ERROR_PREFIXES = ("Error en análisis del plan.", "Error al generar resumen:")
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "50"))
 
 # Usuarios válidos (podrías leerlos desde .env)
 USERS = {
@@ -13,6 +25,78 @@ USERS = {
     "dani": os.getenv("APP_USER_PASS", "dani2025"),
 }
 
+# ==============================
+# CLIENTE HTTP Y CACHÉ
+# ==============================
+@st.cache_resource
+def http() -> requests.Session:
+    """Sesión HTTP compartida por todos los usuarios del proceso (pool de conexiones)."""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=60, show_spinner=False)
+def data_version():
+    """Versión de los datos en el backend; cambia con cada carga del ETL."""
+    try:
+        return http().get(f"{API_URL}/data_version", timeout=API_TIMEOUT).json().get("version")
+    except Exception:
+        return None
+
+def chat(prompt: str, previous_result_id, session_id: str) -> dict:
+    """Llamada a /chat sin caché."""
+    resp = http().post(
+        f"{API_URL}/chat",
+        json={"prompt": prompt, "session_id": session_id, "previous_result_id": previous_result_id},
+        timeout=API_TIMEOUT,
+    )
+    resp.raise_for_status()
+    body = resp.json()
+    answer = body.get("response") or ""
+    if body.get("error") or not answer or answer.startswith(ERROR_PREFIXES):
+        # Una excepción evita que la respuesta fallida quede cacheada
+        raise RuntimeError(body.get("error") or answer or body)
+    return body
+
+@st.cache_data(ttl=ANSWER_CACHE_TTL, show_spinner=False)
+def ask(prompt: str, version, previous_result_id, _session_id: str) -> dict:
+    """
+    Respuesta de /chat cacheada por pregunta, versión de datos y resultado previo al que se refiere.
+    La caché es compartida por todos los usuarios: el result_id previo (único por conversación)
+    evita que un seguimiento reciba la respuesta de otra conversación.
+    Los parámetros con "_" no forman parte de la clave de caché.
+    """
+    return chat(prompt, previous_result_id, _session_id)
+
+@st.cache_data(ttl=ANSWER_CACHE_TTL, show_spinner=False)
+def fetch_page(result_id: str, offset: int, limit: int = PAGE_SIZE) -> dict:
+    resp = http().get(
+        f"{API_URL}/results/{result_id}", params={"offset": offset, "limit": limit}, timeout=API_TIMEOUT
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+def render_data(msg: dict, key: str):
+    """Tabla interactiva con la vista previa; el resto de las filas se pide por páginas a demanda."""
+    preview = msg.get("data") or []
+    if not preview:
+        return
+    st.dataframe(pd.DataFrame(preview), use_container_width=True, hide_index=True)
+    total = msg.get("total_rows", len(preview))
+    result_id = msg.get("result_id")
+    if result_id and total > len(preview):
+        if st.toggle(f"Ver las {total} filas", key=f"more_{key}"):
+            pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+            page = st.number_input("Página", min_value=1, max_value=pages, value=1, key=f"page_{key}")
+            try:
+                rows = fetch_page(result_id, (page - 1) * PAGE_SIZE)["rows"]
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+            except Exception as e:
+                st.warning(f"No se pudo obtener la página (el resultado pudo expirar): {e}")
+
 # ==============================
 # FUNCIÓN LOGIN
 # ==============================
@@ -41,25 +125,46 @@ def main():
 
     if "messages" not in st.session_state:
         st.session_state["messages"] = []
+    # Id de conversación: permite al backend reutilizar el último resultado en preguntas de seguimiento
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
 
-    for msg in st.session_state["messages"]:
+    for i, msg in enumerate(st.session_state["messages"]):
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
+            render_data(msg, str(i))
 
     if prompt := st.chat_input("Escribí tu pregunta..."):
         st.chat_message("user").markdown(prompt)
+        previous = next((m for m in reversed(st.session_state["messages"]) if m["role"] == "assistant"), None)
         st.session_state["messages"].append({"role": "user", "content": prompt})
 
         with st.spinner("Analizando..."):
             try:
-                resp = requests.post(f"{API_URL}/chat", json={"prompt": prompt}).json()
+                if previous is not None and not previous.get("result_id"):
+                    # Seguimiento sin resultado previo identificable: depende de la sesión, no se cachea
+                    resp = chat(prompt.strip(), None, st.session_state["session_id"])
+                else:
+                    resp = ask(
+                        prompt.strip(),
+                        data_version(),
+                        previous.get("result_id") if previous else None,
+                        st.session_state["session_id"],
+                    )
                 if "response" in resp:
                     body = f"**SQL generada:**\n```sql\n{resp.get('sql','')}\n```\n"
                     body += f"**Respuesta:**\n{resp['response']}\n"
-                    st.chat_message("assistant").markdown(body)
-                    st.session_state["messages"].append(
-                        {"role": "assistant", "content": body}
-                    )
+                    msg = {
+                        "role": "assistant",
+                        "content": body,
+                        "data": resp.get("data_preview", []),
+                        "result_id": resp.get("result_id"),
+                        "total_rows": resp.get("total_rows", 0),
+                    }
+                    st.session_state["messages"].append(msg)
+                    with st.chat_message("assistant"):
+                        st.markdown(body)
+                        render_data(msg, str(len(st.session_state["messages"]) - 1))
                 else:
                     st.error(resp)
             except Exception as e: